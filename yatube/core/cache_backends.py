@@ -0,0 +1,187 @@
+"""Кеш в файле SQLite, общий для всех процессов сервера.
+
+База открывается в режиме WAL, поэтому чтения не блокируют запись,
+а изменения сразу видны остальным процессам. Записи вытесняются
+по давности последнего обращения (LRU), когда их больше MAX_ENTRIES.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Время последнего обращения обновляется не чаще, чем раз в столько
+    # секунд, чтобы чтения почти никогда не превращались в запись.
+    access_resolution = 60
+    # Число записей проверяется раз в столько операций записи процесса.
+    cull_every = 64
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._location = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._location, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _write(self, sql, params):
+        connection = self._connection()
+        changed = connection.execute(sql, params).rowcount
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull(connection)
+        return changed
+
+    def _cull(self, connection):
+        now = time.time()
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache'
+            ' ORDER BY accessed LIMIT ?)', (count // self._cull_frequency,))
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        marks = ', '.join('?' * len(key_map))
+        rows = connection.execute(
+            f'SELECT key, value, accessed FROM cache'
+            f' WHERE key IN ({marks}) AND {NOT_EXPIRED}',
+            (*key_map, now)).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > self.access_resolution]
+        if stale:
+            marks = ', '.join('?' * len(stale))
+            connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({marks})',
+                (now, *stale))
+        return {key_map[key]: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+            ' VALUES (?, ?, ?, ?)',
+            (self._key(key, version),
+             pickle.dumps(value, self.pickle_protocol),
+             self._expires(timeout), time.time()))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self.set(key, value, timeout, version)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        changed = self._write(
+            'INSERT INTO cache (key, value, expires, accessed)'
+            ' VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET'
+            ' value = excluded.value, expires = excluded.expires,'
+            ' accessed = excluded.accessed WHERE cache.expires <= ?',
+            (self._key(key, version),
+             pickle.dumps(value, self.pickle_protocol),
+             self._expires(timeout), now, now))
+        return changed == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        changed = self._write(
+            f'UPDATE cache SET expires = ?, accessed = ?'
+            f' WHERE key = ? AND {NOT_EXPIRED}',
+            (self._expires(timeout), now, self._key(key, version), now))
+        return changed == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        # BEGIN IMMEDIATE сразу берёт блокировку записи, поэтому чтение
+        # и запись нового значения атомарны для всех процессов.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (pickle.dumps(value, self.pickle_protocol), time.time(),
+                 key))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+            (self._key(key, version), time.time())).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self._write('DELETE FROM cache WHERE key = ?',
+                    (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            marks = ', '.join('?' * len(keys))
+            self._write(f'DELETE FROM cache WHERE key IN ({marks})', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока, как и у LocMemCache.
+        pass
@@ -0,0 +1,194 @@
+"""Число и время SQL-запросов по представлениям.
+
+QueryMetricsMiddleware перехватывает запросы к базе через
+connection.execute_wrapper и для каждого запроса к сайту записывает
+в гистограммы по имени маршрута (posts:index, posts:profile...) число
+SQL-запросов, их суммарное время и время остальной работы — render.
+DEBUG для этого не нужен: на каждый SQL-запрос добавляется только
+замер времени.
+
+Гистограммы копятся в памяти процесса. Если задан settings.METRICS_CACHE —
+имя общего для процессов кеша из CACHES, — процесс раз
+в METRICS_FLUSH_INTERVAL секунд добавляет накопленное в этот кеш
+через cache.incr, и /metrics/ показывает сумму по всем процессам.
+
+Запросы, которые потоковый ответ выполняет уже после представления,
+не учитываются.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+QUERIES = 'queries'
+SQL = 'sql_seconds'
+RENDER = 'render_seconds'
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+METRICS = {
+    QUERIES: ((0, 1, 2, 3, 5, 10, 20, 50, 100),
+              'SQL-запросов за запрос к представлению.'),
+    SQL: (SECONDS, 'Время SQL-запросов за запрос к представлению, с.'),
+    RENDER: (SECONDS, 'Время запроса к представлению без SQL, с.'),
+}
+# Суммы времени хранятся в микросекундах: cache.incr работает с целыми.
+SCALE = {QUERIES: 1, SQL: 1_000_000, RENDER: 1_000_000}
+
+# Вызываются с именем представления и словарём замеров; см. testing.
+listeners = []
+
+
+class Registry:
+    """Гистограммы процесса: (представление, метрика) → корзины и сумма."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.flushed = time.monotonic()
+        self.registered = set()
+
+    def observe(self, view, values):
+        with self.lock:
+            for metric, value in values.items():
+                bounds = METRICS[metric][0]
+                counts = self.data.setdefault(
+                    (view, metric), [0] * (len(bounds) + 2))
+                counts[bisect_left(bounds, value)] += 1
+                counts[-1] += round(value * SCALE[metric])
+        for listener in listeners:
+            listener(view, values)
+
+    def take(self):
+        with self.lock:
+            data, self.data = self.data, {}
+            self.flushed = time.monotonic()
+        return data
+
+    def flush(self, cache):
+        """Добавляет накопленное в общий кеш."""
+        for (view, metric), counts in self.take().items():
+            if view not in self.registered:
+                register(cache, view)
+                self.registered.add(view)
+            for index, count in enumerate(counts):
+                if count:
+                    increment(cache, key(view, metric, index), count)
+
+    def maybe_flush(self):
+        if not settings.METRICS_CACHE:
+            return
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush(caches[settings.METRICS_CACHE])
+
+    def snapshot(self):
+        if not settings.METRICS_CACHE:
+            with self.lock:
+                return {name: list(counts)
+                        for name, counts in self.data.items()}
+        cache = caches[settings.METRICS_CACHE]
+        self.flush(cache)
+        return read(cache)
+
+
+registry = Registry()
+
+
+def key(view, metric, index):
+    return f'metrics:{view}:{metric}:{index}'
+
+
+def increment(cache, name, delta):
+    cache.add(name, 0, None)
+    try:
+        return cache.incr(name, delta)
+    except ValueError:
+        # Ключ вытеснен между add и incr.
+        cache.set(name, delta, None)
+        return delta
+
+
+def register(cache, view):
+    """Запоминает имя представления в общем кеше, один раз на все процессы.
+
+    Кеш не умеет перечислять ключи, поэтому имена хранятся списком:
+    счётчик metrics:views и metrics:views:<номер> → имя.
+    """
+    if cache.add(f'metrics:view:{view}', True, None):
+        number = increment(cache, 'metrics:views', 1)
+        cache.set(f'metrics:views:{number}', view, None)
+
+
+def read(cache):
+    total = cache.get('metrics:views', 0)
+    views = cache.get_many(
+        [f'metrics:views:{number}' for number in range(1, total + 1)])
+    names = {
+        key(view, metric, index): (view, metric, index)
+        for view in views.values()
+        for metric, (bounds, _) in METRICS.items()
+        for index in range(len(bounds) + 2)}
+    data = {}
+    for name, value in cache.get_many(list(names)).items():
+        view, metric, index = names[name]
+        bounds = METRICS[metric][0]
+        data.setdefault((view, metric), [0] * (len(bounds) + 2))
+        data[view, metric][index] = value
+    return data
+
+
+def export(data):
+    """Гистограммы в текстовом формате Prometheus."""
+    lines = []
+    for metric, (bounds, description) in METRICS.items():
+        name = f'yatube_view_{metric}'
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for (view, kind), counts in sorted(data.items()):
+            if kind != metric:
+                continue
+            label = f'view="{view}"'
+            total = 0
+            for bound, count in zip((*bounds, '+Inf'), counts):
+                total += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+            lines.append(f'{name}_sum{{{label}}} {counts[-1] / SCALE[metric]}')
+            lines.append(f'{name}_count{{{label}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+class Probe:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryMetricsMiddleware:
+    """Стоит первой, чтобы учесть запросы всех остальных middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        probe = Probe()
+        start = time.perf_counter()
+        with connection.execute_wrapper(probe):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            registry.observe(match.view_name, {
+                QUERIES: probe.count,
+                SQL: probe.time,
+                RENDER: max(0.0, elapsed - probe.time),
+            })
+            registry.maybe_flush()
+        return response
@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = (
+    ('LocMemCache', 'django.core.cache.backends.locmem.LocMemCache', None),
+    ('FileBasedCache',
+     'django.core.cache.backends.filebased.FileBasedCache', 'files'),
+    ('SQLiteCache', 'core.cache_backends.SQLiteCache', 'cache.sqlite3'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость кеш-бэкендов: операций в секунду.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        directory = tempfile.mkdtemp()
+        try:
+            for name, backend, location in BACKENDS:
+                location = str(Path(directory) / location) if location else ''
+                cache = import_string(backend)(
+                    location, {'OPTIONS': {'MAX_ENTRIES': operations * 2}})
+                results = self.measure(cache, operations)
+                self.stdout.write(name + ': ' + ', '.join(
+                    f'{op} {rate:.0f}/s' for op, rate in results))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def measure(self, cache, operations):
+        value = {'ids': list(range(10)), 'html': 'x' * 2000}
+        keys = [f'key_{i}' for i in range(operations)]
+        cache.set('counter', 0)
+        steps = (
+            ('set', lambda key: cache.set(key, value)),
+            ('get', lambda key: cache.get(key)),
+            ('get_many', lambda key: cache.get_many(keys[:10])),
+            ('incr', lambda key: cache.incr('counter')),
+        )
+        results = []
+        for name, step in steps:
+            start = time.perf_counter()
+            for key in keys:
+                step(key)
+            results.append((name, operations / (time.perf_counter() - start)))
+        return results
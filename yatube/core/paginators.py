@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) вместо OFFSET.
+
+    Страницы запрашиваются токенами ?after= и ?before=, поэтому стоимость
+    любой страницы не зависит от её глубины. Старые ссылки ?page=N
+    обслуживаются обычным Paginator, но не дальше settings.MAX_OFFSET_PAGE.
+    По умолчанию новые объекты идут первыми, descending=False — наоборот.
+    Строками могут быть и словари из .values() с полями date_field
+    и pk_field.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 pk_field='pk', count=None, descending=True, **kwargs):
+        if count is not None:
+            # Заранее известное число объектов избавляет от COUNT(*).
+            self.count = count
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.descending = descending
+        sign = '-' if descending else ''
+        object_list = object_list.order_by(f'{sign}{date_field}',
+                                           f'{sign}{pk_field}')
+        super().__init__(object_list, per_page, **kwargs)
+        self.legacy = False
+        self.cursor = ''
+        self._rows = None
+        self._previous_cursor = None
+        self._next_cursor = None
+
+    @property
+    def previous_cursor(self):
+        self._evaluate()
+        return self._previous_cursor
+
+    @property
+    def next_cursor(self):
+        self._evaluate()
+        return self._next_cursor
+
+    def restore(self, previous_cursor, next_cursor):
+        """Восстанавливает страницу, строки которой взяты из кеша."""
+        self._rows = None
+        self._previous_cursor = previous_cursor
+        self._next_cursor = next_cursor
+
+    def _evaluate(self):
+        if self._rows is not None:
+            len(self._rows)
+
+    def get_page(self, number=None, after=None, before=None):
+        if number is not None and not (after or before):
+            self.legacy = True
+            try:
+                number = min(int(number), settings.MAX_OFFSET_PAGE)
+            except (TypeError, ValueError):
+                number = 1
+            return super().get_page(number)
+        return self.cursor_page(after=after, before=before)
+
+    def cursor_page(self, after=None, before=None):
+        forward = not before
+        token = after if forward else before
+        key = self.decode_cursor(token)
+        if key is not None:
+            self.cursor = f"{'after' if forward else 'before'}:{token}"
+        # Строки выбираются при первом обращении к странице, поэтому
+        # закешированный фрагмент шаблона не обращается к базе.
+        self._rows = SimpleLazyObject(
+            lambda: self.fetch(forward, token, key))
+        return self._get_page(self._rows, 1, self)
+
+    def fetch(self, forward, token, key):
+        if key is None:
+            return self.fetch_first()
+        date, pk = key
+        field, pk_field = self.date_field, self.pk_field
+        # Для прямого порядка сравнения меняются местами.
+        onward, back = ('lte', 'gte') if self.descending else ('gte', 'lte')
+        # Условие записано как диапазон по дате, чтобы страница читалась
+        # одним проходом по индексу (дата, id).
+        if forward:
+            lookup = (Q(**{f'{field}__{onward}': date})
+                      & ~Q(**{field: date, f'{pk_field}__{back}': pk}))
+            rows = list(self.object_list.filter(lookup)[:self.per_page + 1])
+            if len(rows) > self.per_page:
+                rows = rows[:self.per_page]
+                self._next_cursor = self.encode_cursor(rows[-1])
+            self._previous_cursor = (self.encode_cursor(rows[0]) if rows
+                                     else token)
+            return rows
+        lookup = (Q(**{f'{field}__{back}': date})
+                  & ~Q(**{field: date, f'{pk_field}__{onward}': pk}))
+        rows = list(self.object_list.filter(lookup)
+                    .reverse()[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            return self.fetch_first()
+        rows = rows[self.per_page - 1::-1]
+        self._previous_cursor = self.encode_cursor(rows[0])
+        self._next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def fetch_first(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            self._next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def encode_cursor(self, obj):
+        if isinstance(obj, dict):
+            date, pk = obj[self.date_field], obj[self.pk_field]
+        else:
+            date = getattr(obj, self.date_field)
+            pk = getattr(obj, self.pk_field)
+        return urlsafe_base64_encode(f'{date.isoformat()}|{pk}'.encode())
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            date, pk = urlsafe_base64_decode(token).decode().split('|')
+            date = parse_datetime(date)
+            pk = int(pk)
+        except ValueError:
+            return None
+        if date is None:
+            return None
+        return date, pk
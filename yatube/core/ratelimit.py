@@ -0,0 +1,110 @@
+"""Ограничение частоты запросов скользящим окном.
+
+Окно приближается двумя счётчиками в кеше: запросы текущего
+интервала длиной window и предыдущего, взятые с весом оставшейся
+в окне доли предыдущего интервала. Счётчик увеличивается атомарным
+cache.incr, поэтому процессы с общим кешем делят лимит без гонок.
+Отклонённые запросы тоже учитываются: скрипт, который продолжает
+слать запросы, остаётся заблокированным.
+
+Запросы считаются по пользователю, а анонимные — по IP-адресу
+из REMOTE_ADDR; за прокси его должен выставлять сам прокси.
+
+RateLimitMiddleware ограничивает представления из settings.RATELIMITS
+по имени маршрута, декоратор ratelimit — отдельное представление.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .views import too_many_requests
+
+DEFAULT_METHODS = ('POST',)
+
+
+def client_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def retry_after(limit, window, elapsed, current, previous):
+    """Через сколько секунд следующий запрос уложится в лимит."""
+    room = limit - current - 1
+    if previous and room >= 0:
+        # Хватит того, что вес предыдущего интервала уменьшится.
+        wait = window * (1 - room / previous) - elapsed
+    else:
+        wait = (window - elapsed
+                + window * max(0, 1 - (limit - 1) / current))
+    return max(1, math.ceil(wait))
+
+
+def hit(scope, key, limit, window):
+    """Учитывает запрос; 0, если он в лимите, иначе Retry-After."""
+    now = time.time()
+    slot = int(now // window)
+    elapsed = now - slot * window
+    current_key = f'ratelimit:{scope}:{key}:{slot}'
+    cache.add(current_key, 0, 2 * window)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Ключ вытеснен между add и incr.
+        cache.set(current_key, 1, 2 * window)
+        current = 1
+    previous = cache.get(f'ratelimit:{scope}:{key}:{slot - 1}', 0)
+    if current + previous * (1 - elapsed / window) <= limit:
+        return 0
+    return retry_after(limit, window, elapsed, current, previous)
+
+
+def check(request, scope, limit, window, methods=DEFAULT_METHODS):
+    """Ответ 429, если запрос превысил лимит, иначе None."""
+    if request.method not in methods:
+        return None
+    wait = hit(scope, client_key(request), limit, window)
+    if not wait:
+        return None
+    return too_many_requests(request, wait)
+
+
+def ratelimit(limit, window, methods=DEFAULT_METHODS):
+    """Не больше limit запросов за window секунд к представлению."""
+    def decorator(view):
+        scope = f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = check(request, scope, limit, window, methods)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Лимиты settings.RATELIMITS по имени маршрута.
+
+    Для остальных представлений — один поиск в словаре на запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.view_name
+        rule = settings.RATELIMITS.get(name)
+        if rule is None:
+            return None
+        limit, window, *methods = rule
+        return check(request, name, limit, window,
+                     methods or DEFAULT_METHODS)
@@ -0,0 +1,41 @@
+"""Хранилище, которое называет файлы по хешу содержимого.
+
+Одинаковые загрузки получают одно имя и хранятся в одном экземпляре,
+поэтому и миниатюры для них создаются один раз. Файлы раскладываются
+по подкаталогам из первых знаков хеша (posts/ab/cd/abcd...jpg), чтобы
+ни в одном каталоге не оказалось миллионов файлов.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл под именем sha256 его содержимого.
+
+    Хеш считается по частям через chunks(), так что большие загрузки,
+    уже лежащие во временном файле, не читаются в память целиком.
+    Файл, который уже есть в хранилище, повторно не записывается.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = self.hashed_name(name, digest.hexdigest())
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def hashed_name(name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4],
+                            digest + extension)
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from . import instrumentation
+
+
+class QueryBudgetMixin:
+    """Проверка бюджетов SQL-запросов по именам представлений.
+
+    Считает QueryMetricsMiddleware, поэтому учитываются и запросы
+    middleware — сессия, пользователь, — как в продакшене.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budgets):
+        """Каждый запрос к представлению из budgets укладывается в его
+        бюджет, и к каждому из них был хотя бы один запрос."""
+        samples = []
+        listener = (lambda view, values:
+                    samples.append((view, values[instrumentation.QUERIES])))
+        instrumentation.listeners.append(listener)
+        try:
+            yield samples
+        finally:
+            instrumentation.listeners.remove(listener)
+        missing = set(budgets) - {view for view, _ in samples}
+        if missing:
+            self.fail('Не было запросов к ' + ', '.join(sorted(missing)))
+        over = [f'{view}: {count} > {budgets[view]}'
+                for view, count in samples
+                if view in budgets and count > budgets[view]]
+        if over:
+            self.fail('Превышен бюджет SQL-запросов: ' + '; '.join(over))
@@ -0,0 +1,227 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from . import instrumentation
+from .cache_backends import SQLiteCache
+from .ratelimit import ratelimit
+from .storage import ContentAddressedStorage
+
+User = get_user_model()
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = str(Path(self.directory) / 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {'TIMEOUT': None})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются пачкой и удаляются."""
+        self.cache.set('post', {'id': 1, 'text': 'Текст'})
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(self.cache.get('post'), {'id': 1, 'text': 'Текст'})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2]})
+        self.cache.delete_many(['a', 'post'])
+        self.assertIsNone(self.cache.get('post'))
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'b': [2]})
+
+    def test_set_many_is_atomic(self):
+        """Ошибка посреди set_many не оставляет половину записей."""
+        with self.assertRaises(Exception):
+            self.cache.set_many({'a': 1, 'b': lambda: None})
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_timeout_and_add(self):
+        """Просроченные записи не читаются, add не перезаписывает живые."""
+        self.cache.set('short', 1, timeout=0.5)
+        self.assertFalse(self.cache.add('short', 2))
+        time.sleep(0.6)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 3))
+        self.assertEqual(self.cache.get('short'), 3)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+        cache.cull_every = 1
+        cache.access_resolution = 0
+        for i in range(10):
+            cache.set(f'key_{i}', i)
+        time.sleep(0.01)
+        cache.get('key_0')
+        cache.set('key_10', 10)
+        self.assertEqual(cache.get('key_0'), 0)
+        self.assertIsNone(cache.get('key_1'))
+        self.assertEqual(cache.get('key_10'), 10)
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет увеличений."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=increment,
+                                     args=(self.location, 50))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое сохраняется один раз под именем хеша."""
+        first = self.storage.save('posts/a.JPG', ContentFile(b'picture'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'picture'))
+        other = self.storage.save('posts/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first,
+                         r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}'
+                         r'\.jpg$')
+        self.assertEqual(len(list(Path(self.directory).glob('posts/*/*/*'))),
+                         2)
+
+
+@ratelimit(2, 10)
+def limited_view(request):
+    return HttpResponse('ok')
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def call_at(self, now, address='10.0.0.1'):
+        request = RequestFactory().post('/', REMOTE_ADDR=address)
+        request.user = AnonymousUser()
+        with mock.patch('core.ratelimit.time.time', return_value=now):
+            return limited_view(request)
+
+    def test_sliding_window(self):
+        """Окно скользит: предыдущий интервал учитывается с весом."""
+        self.assertEqual(self.call_at(1000).status_code, 200)
+        self.assertEqual(self.call_at(1001).status_code, 200)
+        response = self.call_at(1005)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '12')
+        self.assertEqual(self.call_at(1005, '10.0.0.2').status_code, 200)
+        self.assertEqual(self.call_at(1017).status_code, 200)
+        self.assertEqual(self.call_at(1017).status_code, 429)
+
+    @override_settings(RATELIMITS={'users:login': (2, 60)})
+    def test_middleware_limits_by_ip(self):
+        """Лимит из настроек считает POST анонимов по IP."""
+        url = reverse('users:login')
+        data = {'username': 'leo', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, data, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RATELIMITS={'posts:profile_follow': (1, 60, 'GET')})
+    def test_middleware_limits_by_user(self):
+        """Запросы вошедших пользователей считаются по пользователю."""
+        author = User.objects.create_user(username='leo')
+        url = reverse('posts:profile_follow', args=[author.username])
+        for username in ('kate', 'max'):
+            self.client.force_login(User.objects.create_user(
+                username=username))
+            self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 429)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_export_histograms(self):
+        """Гистограммы выводятся в формате Prometheus с накоплением."""
+        registry = instrumentation.Registry()
+        for queries in (1, 4, 4):
+            registry.observe('posts:index', {instrumentation.QUERIES: queries,
+                                             instrumentation.SQL: 0.002})
+        text = instrumentation.export(registry.snapshot())
+        name = 'yatube_view_queries'
+        for line in ('# TYPE yatube_view_queries histogram',
+                     f'{name}_bucket{{view="posts:index",le="1"}} 1',
+                     f'{name}_bucket{{view="posts:index",le="3"}} 1',
+                     f'{name}_bucket{{view="posts:index",le="5"}} 3',
+                     f'{name}_bucket{{view="posts:index",le="+Inf"}} 3',
+                     f'{name}_sum{{view="posts:index"}} 9.0',
+                     f'{name}_count{{view="posts:index"}} 3',
+                     'yatube_view_sql_seconds_sum{view="posts:index"} 0.006'):
+            self.assertIn(line, text.splitlines())
+
+    @override_settings(METRICS_CACHE='default')
+    def test_processes_share_cache(self):
+        """Процессы складывают гистограммы в общем кеше."""
+        workers = [instrumentation.Registry() for _ in range(2)]
+        for number, worker in enumerate(workers):
+            worker.observe('posts:index', {instrumentation.QUERIES: 2})
+            worker.observe(f'posts:view_{number}',
+                           {instrumentation.QUERIES: 1})
+            worker.flush(cache)
+        data = instrumentation.read(cache)
+        self.assertEqual(data['posts:index', 'queries'][-1], 4)
+        self.assertEqual(data['posts:index', 'queries'][2], 2)
+        self.assertIn(('posts:view_1', 'queries'), data)
+
+    def test_endpoint(self):
+        """Страница метрик учитывает запросы и открыта только сотрудникам."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.client.force_login(User.objects.create_user(
+            username='admin', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response['Content-Type'])
+        self.assertContains(
+            response, 'yatube_view_render_seconds_count{view="posts:index"}')
+
+    @override_settings(METRICS_IPS=['10.0.0.5'])
+    def test_endpoint_allowed_ips(self):
+        """Страница метрик открыта адресам из METRICS_IPS."""
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
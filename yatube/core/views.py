@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import instrumentation
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,20 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def metrics(request):
+    """Гистограммы SQL-запросов по представлениям для Prometheus."""
+    if (request.META.get('REMOTE_ADDR') not in settings.METRICS_IPS
+            and not request.user.is_staff):
+        raise Http404
+    return HttpResponse(
+        instrumentation.export(instrumentation.registry.snapshot()),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,15 +1,29 @@
 from django.contrib import admin
 
+from . import search, thumbnails
+from .forms import PostAdminForm
 from .models import Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%'.
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'description', 'slug')
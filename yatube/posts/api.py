@@ -0,0 +1,200 @@
+"""JSON API только для чтения: ленты, посты и комментарии.
+
+Ответы собираются из словарей .values() без создания экземпляров
+моделей: в запрос попадают только колонки полей из ?fields=, а автор
+и группа присоединяются в том же запросе. Ленты листаются курсорами
+?after= и ?before= так же, как HTML-страницы, и по тем же версиям кеша
+отвечают 304 Not Modified.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
+
+from core.paginators import CursorPaginator
+from . import caching, timeline
+from .models import Comment, Post, TimelineEntry
+from .views import group_etag, index_etag, profile_etag
+
+
+class BadRequest(Exception):
+    """Ошибка в параметрах запроса, ответ 400."""
+    status = 400
+
+
+class NotAuthenticated(BadRequest):
+    status = 401
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+class Serializer:
+    """Словари ответа из строк .values().
+
+    fields — {поле ответа: (выражение для .values(), преобразование)},
+    default — поля ответа без ?fields=.
+    """
+
+    def __init__(self, fields, default):
+        self.fields = fields
+        self.default = default
+
+    def select(self, request):
+        names = request.GET.get('fields')
+        if not names:
+            return self.default
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}. '
+                             f'Доступны: {", ".join(self.fields)}.')
+        return names
+
+    def columns(self, names, *keys):
+        """Колонки запроса: поля ответа и ключи курсора без повторов."""
+        return list(dict.fromkeys(
+            [*keys, *(self.fields[name][0] for name in names)]))
+
+    def dump(self, row, names):
+        result = {}
+        for name in names:
+            column, convert = self.fields[name]
+            value = row[column]
+            result[name] = convert(value) if convert else value
+        return result
+
+
+POSTS = Serializer({
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', isoformat),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', image_url),
+    'comments_count': ('comments_count', None),
+}, default=('id', 'text', 'pub_date', 'author', 'group', 'image',
+            'comments_count'))
+COMMENTS = Serializer({
+    'id': ('id', None),
+    'post': ('post_id', None),
+    'author': ('author__username', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', isoformat),
+}, default=('id', 'author', 'text', 'pub_date'))
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(etag_func=None):
+    """Отдаёт словарь представления в JSON, ошибки — тоже в JSON.
+
+    С etag_func представление отвечает 304 через condition.
+    """
+    def decorator(view):
+        def json_view(request, *args, **kwargs):
+            return json_response(view(request, *args, **kwargs))
+
+        if etag_func is not None:
+            json_view = condition(etag_func=etag_func)(json_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return json_view(request, *args, **kwargs)
+            except BadRequest as error:
+                return json_response({'error': str(error)}, error.status)
+            except Http404:
+                return json_response({'error': 'Не найдено.'}, 404)
+        return wrapper
+    return decorator
+
+
+def paginate(request, rows, per_page=None, **kwargs):
+    paginator = CursorPaginator(rows, per_page or settings.POSTS_ON_PAGE,
+                                **kwargs)
+    page_obj = paginator.cursor_page(after=request.GET.get('after'),
+                                     before=request.GET.get('before'))
+    return list(page_obj), paginator
+
+
+def page(request, queryset, serializer, **kwargs):
+    names = serializer.select(request)
+    rows = queryset.values(*serializer.columns(names, 'id', 'pub_date'))
+    rows, paginator = paginate(request, rows, pk_field='id', **kwargs)
+    return {'results': [serializer.dump(row, names) for row in rows],
+            'previous': paginator.previous_cursor,
+            'next': paginator.next_cursor}
+
+
+@api_view(etag_func=index_etag)
+def index(request):
+    return page(request, Post.objects.all(), POSTS)
+
+
+@api_view(etag_func=group_etag)
+def group_posts(request, slug):
+    return page(request, Post.objects.filter(group=request.group), POSTS)
+
+
+@api_view(etag_func=profile_etag)
+def profile(request, username):
+    return page(request, Post.objects.filter(author=request.author), POSTS)
+
+
+def post_etag(request, post_id):
+    # Строка со всеми полями нужна для версии автора и для ответа.
+    request.post_row = get_object_or_404(
+        Post.objects.values(*POSTS.columns(POSTS.fields, 'author_id')),
+        pk=post_id)
+    return caching.etag(request, (caching.POST, post_id),
+                        (caching.AUTHOR, request.post_row['author_id']),
+                        (caching.USERS, None), (caching.GROUPS, None))
+
+
+@api_view(etag_func=post_etag)
+def post_detail(request, post_id):
+    return POSTS.dump(request.post_row, POSTS.select(request))
+
+
+def comments_etag(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return caching.etag(request, (caching.POST, post_id),
+                        (caching.USERS, None))
+
+
+@api_view(etag_func=comments_etag)
+def comments(request, post_id):
+    return page(request, Comment.objects.filter(post=post_id), COMMENTS,
+                per_page=settings.COMMENTS_ON_PAGE,
+                descending=request.GET.get('order') == 'newest')
+
+
+@api_view()
+def follow(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated('Лента подписок доступна после входа.')
+    names = POSTS.select(request)
+    timeline.pull_celebrities(request.user)
+    entries = (TimelineEntry.objects.filter(user=request.user)
+               .values('post_id', 'pub_date'))
+    entries, paginator = paginate(request, entries, pk_field='post_id')
+    ids = [entry['post_id'] for entry in entries]
+    posts = {row['id']: row for row in Post.objects.filter(pk__in=ids)
+             .values(*POSTS.columns(names, 'id'))}
+    return {'results': [POSTS.dump(posts[pk], names)
+                        for pk in ids if pk in posts],
+            'previous': paginator.previous_cursor,
+            'next': paginator.next_cursor}
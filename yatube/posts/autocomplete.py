@@ -0,0 +1,165 @@
+"""Автодополнение имён пользователей и групп по префиксу.
+
+Имена хранятся в памяти процесса в отсортированных списках, префикс
+ищется двоичным поиском, поэтому запрос не обращается к базе.
+
+Списки сверяются с двумя версиями в кеше, без срока хранения: changed
+увеличивается при изменении и удалении записей, и список строится
+заново; added — при регистрации, и в список вставляются только записи
+с pk больше последнего известного. С кешем в памяти процесса версии
+других процессов не видны, поэтому новые записи проверяются ещё и раз
+в PAGE_CACHE_TIMEOUT секунд; изменения из других процессов там видны
+только после перезапуска.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from . import caching
+from .models import Group
+
+User = get_user_model()
+
+LIMIT = 10
+
+
+class PrefixIndex:
+    """Отсортированные ключи и записи с поиском по префиксу."""
+
+    def __init__(self, entries):
+        entries = list(entries)
+        self.last_pk = max((pk for pk, _, _ in entries), default=0)
+        entries = sorted(((key.lower(), item) for _, key, item in entries
+                          if key), key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.items = [item for _, item in entries]
+
+    def added(self, entries):
+        """Копия индекса с новыми записями, без запроса всех записей."""
+        # Читатели без блокировки видят старый индекс или новый целиком.
+        index = PrefixIndex(())
+        index.keys, index.items = list(self.keys), list(self.items)
+        index.last_pk = self.last_pk
+        for pk, key, item in entries:
+            index.last_pk = max(index.last_pk, pk)
+            if not key:
+                continue
+            key = key.lower()
+            # bisect.insort, но с той же позицией и в списке записей.
+            position = bisect.bisect_right(index.keys, key)
+            index.keys.insert(position, key)
+            index.items.insert(position, item)
+        return index
+
+    def find(self, prefix, limit=LIMIT):
+        prefix = prefix.lower()
+        found = {}
+        position = bisect.bisect_left(self.keys, prefix)
+        while (position < len(self.keys) and len(found) < limit
+               and self.keys[position].startswith(prefix)):
+            # Группа может найтись и по названию, и по slug.
+            item = self.items[position]
+            found.setdefault(id(item), item)
+            position += 1
+        return list(found.values())
+
+
+def user_entries(after=0):
+    for pk, username, first_name, last_name in (
+            User.objects.filter(is_active=True, pk__gt=after)
+            .values_list('pk', 'username', 'first_name', 'last_name')
+            .iterator()):
+        item = {'username': username,
+                'name': f'{first_name} {last_name}'.strip(),
+                'url': reverse('posts:profile', args=[username])}
+        yield pk, username, item
+
+
+def group_entries(after=0):
+    for pk, slug, title in (Group.objects.filter(pk__gt=after)
+                            .values_list('pk', 'slug', 'title').iterator()):
+        item = {'slug': slug, 'title': title,
+                'url': reverse('posts:group_list', args=[slug])}
+        yield pk, title, item
+        yield pk, slug, item
+
+
+SOURCES = {
+    'users': user_entries,
+    'groups': group_entries,
+}
+CHANGED = 'changed'
+ADDED = 'added'
+# Имя → (changed, added, время проверки, индекс).
+_indexes = {}
+_lock = threading.Lock()
+
+
+def version_key(name, kind):
+    return f'posts:autocomplete:{name}:{kind}'
+
+
+def bump(name, kind):
+    key = version_key(name, kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, caching.initial_version(), None)
+
+
+def users_added():
+    bump('users', ADDED)
+
+
+def users_changed():
+    bump('users', CHANGED)
+
+
+def groups_changed():
+    bump('groups', CHANGED)
+
+
+def versions(name):
+    keys = [version_key(name, CHANGED), version_key(name, ADDED)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, caching.initial_version(), None)
+            found[key] = cache.get(key)
+    return found[keys[0]], found[keys[1]]
+
+
+def stale(checked):
+    """Пора ли искать записи, добавленные другими процессами."""
+    return (not caching.shared()
+            and settings.PAGE_CACHE_TIMEOUT is not None
+            and time.monotonic() - checked >= settings.PAGE_CACHE_TIMEOUT)
+
+
+def get_index(name):
+    changed, added = versions(name)
+    cached = _indexes.get(name)
+    if (cached is not None and cached[:2] == (changed, added)
+            and not stale(cached[2])):
+        return cached[3]
+    with _lock:
+        cached = _indexes.get(name)
+        if cached is None or cached[0] != changed:
+            index = PrefixIndex(SOURCES[name]())
+        elif cached[1] != added or stale(cached[2]):
+            index = cached[3].added(SOURCES[name](after=cached[3].last_pk))
+        else:
+            return cached[3]
+        _indexes[name] = (changed, added, time.monotonic(), index)
+    return index
+
+
+def complete(prefix, limit=LIMIT):
+    if not prefix:
+        return {name: [] for name in SOURCES}
+    return {name: get_index(name).find(prefix, limit) for name in SOURCES}
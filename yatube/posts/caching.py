@@ -0,0 +1,107 @@
+"""Версии кеша страниц по областям изменений.
+
+В ключ закешированных фрагментов входят версии областей: вся лента,
+группа, автор, пост и данные пользователей. Сохранение и удаление
+постов, комментариев и групп увеличивают версии затронутых областей,
+и старые фрагменты больше не читаются.
+
+С общим для процессов кешем версии и фрагменты хранятся без срока.
+С кешем в памяти процесса — не дольше settings.PAGE_CACHE_TIMEOUT:
+изменения из других процессов видны с такой задержкой.
+
+Из тех же версий собираются ETag страниц: пока версии не изменились,
+страница отвечает 304 Not Modified, не выполняя запросы и не рендеря
+шаблон.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.crypto import salted_hmac
+
+# Кеши, которые видны только своему процессу.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+FEED = 'feed'
+GROUP = 'group'
+AUTHOR = 'author'
+POST = 'post'
+USERS = 'users'
+FOLLOWS = 'follows'
+GROUPS = 'groups'
+# Комментарии пользователя в очереди записи.
+DRAFTS = 'drafts'
+
+
+def shared():
+    """Общий ли кеш default для всех процессов сервера."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def version_key(scope, pk=None):
+    return f'posts:version:{scope}:{pk}'
+
+
+def initial_version():
+    # Версия после вытеснения ключа не совпадёт ни с одной из прежних.
+    return time.time_ns()
+
+
+def bounded(timeout):
+    """Срок кеша, сбрасываемого версиями, не больше PAGE_CACHE_TIMEOUT."""
+    if settings.PAGE_CACHE_TIMEOUT is None:
+        return timeout
+    if timeout is None:
+        return settings.PAGE_CACHE_TIMEOUT
+    return min(timeout, settings.PAGE_CACHE_TIMEOUT)
+
+
+def bump(scope, pk=None):
+    key = version_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_version(), settings.PAGE_CACHE_TIMEOUT)
+
+
+def page_version(*scopes):
+    """Строка версий для ключа кеша, scopes — пары (область, pk)."""
+    keys = [version_key(scope, pk) for scope, pk in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, initial_version(), settings.PAGE_CACHE_TIMEOUT)
+        versions.update(cache.get_many(missing))
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def etag(request, *scopes):
+    """ETag страницы: версии её областей и текущий пользователь."""
+    return f'{request.user.pk}:{page_version(*scopes)}'
+
+
+def form_etag(request, *scopes):
+    """ETag страницы с формой: ещё и хеш CSRF-токена.
+
+    Токен меняется при входе на сайт, и копия страницы с прежним токеном
+    не должна отвечать 304: форма с ней вернёт 403. get_token создаёт
+    токен, если cookie ещё нет; сам он маскируется заново при каждом
+    вызове, поэтому хешируется значение cookie.
+    """
+    get_token(request)
+    digest = salted_hmac('posts.caching.form_etag',
+                         request.META['CSRF_COOKIE']).hexdigest()[:16]
+    return f'{etag(request, *scopes)}:{digest}'
+
+
+def post_changed(post, old_group_id=None):
+    bump(FEED)
+    bump(AUTHOR, post.author_id)
+    bump(POST, post.pk)
+    for group_id in {post.group_id, old_group_id} - {None}:
+        bump(GROUP, group_id)
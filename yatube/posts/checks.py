@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from . import caching, comment_queue
+
+
+@register()
+def comment_queue_cache(app_configs, **kwargs):
+    if settings.COMMENT_QUEUE and not caching.shared():
+        return [Error(comment_queue.CACHE_ERROR, id='posts.E001')]
+    return []
@@ -0,0 +1,139 @@
+"""Отложенная запись комментариев.
+
+Если задан settings.COMMENT_QUEUE, add_comment не пишет в основную
+базу: проверенный комментарий добавляется в очередь — отдельный файл
+SQLite в режиме WAL со своей блокировкой записи, — и ответ уходит
+сразу. Команда flush_comments забирает очередь пачками, записывает
+каждую одним bulk_create и увеличивает версию кеша каждого поста
+один раз на пачку.
+
+Пока комментарий в очереди, его автор видит его на странице поста:
+pending() читает из очереди комментарии автора к посту, а версия
+области DRAFTS автора меняет ETag страницы.
+
+Версии сбрасывает процесс flush_comments, поэтому очередь работает
+только с общим для процессов кешем: иначе записанные комментарии
+не появятся на страницах, а из очереди они уже исчезнут.
+
+Запись в базу и удаление из очереди не атомарны: если процесс упадёт
+между ними, пачка запишется повторно. Очередь разбирает один процесс.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from . import caching, counters
+from .models import Comment, Post, User
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS comment ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, post_id INTEGER NOT NULL,'
+    ' author_id INTEGER NOT NULL, text TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS comment_post_author'
+    ' ON comment (post_id, author_id)',
+)
+
+_local = threading.local()
+
+
+CACHE_ERROR = ('Очередь комментариев COMMENT_QUEUE требует общего для '
+               'процессов кеша default, например SQLITE_CACHE.')
+
+
+def enabled():
+    if not settings.COMMENT_QUEUE:
+        return False
+    if not caching.shared():
+        raise ImproperlyConfigured(CACHE_ERROR)
+    return True
+
+
+def connection():
+    path = settings.COMMENT_QUEUE
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    if path not in connections:
+        db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        # Запись переживает падение процесса; при сбое питания WAL
+        # с synchronous=NORMAL может потерять последние транзакции.
+        db.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            db.execute(statement)
+        connections[path] = db
+    return connections[path]
+
+
+def put(post_id, author_id, text):
+    connection().execute(
+        'INSERT INTO comment (post_id, author_id, text, created)'
+        ' VALUES (?, ?, ?, ?)', (post_id, author_id, text, time.time()))
+    caching.bump(caching.DRAFTS, author_id)
+
+
+def pending(post, user):
+    """Несохранённые комментарии пользователя к посту, из очереди."""
+    if not enabled() or not user.is_authenticated:
+        return []
+    rows = connection().execute(
+        'SELECT text, created FROM comment'
+        ' WHERE post_id = ? AND author_id = ? ORDER BY id',
+        (post.pk, user.pk)).fetchall()
+    return [Comment(post=post, author=user, text=text,
+                    pub_date=datetime.fromtimestamp(created, timezone.utc))
+            for text, created in rows]
+
+
+def size():
+    return connection().execute('SELECT COUNT(*) FROM comment').fetchone()[0]
+
+
+def flush_batch(batch_size):
+    """Записывает одну пачку, возвращает число взятых из очереди."""
+    queue = connection()
+    rows = queue.execute(
+        'SELECT id, post_id, author_id, text, created FROM comment'
+        ' ORDER BY id LIMIT ?', (batch_size,)).fetchall()
+    if not rows:
+        return 0
+    # Комментарии к удалённым за это время постам и от удалённых
+    # пользователей отбрасываются, иначе пачка не запишется никогда.
+    posts = set(Post.objects.filter(pk__in={row[1] for row in rows})
+                .values_list('pk', flat=True))
+    authors = set(User.objects.filter(pk__in={row[2] for row in rows})
+                  .values_list('pk', flat=True))
+    comments = [Comment(post_id=post_id, author_id=author_id, text=text,
+                        pub_date=datetime.fromtimestamp(created,
+                                                        timezone.utc))
+                for _, post_id, author_id, text, created in rows
+                if post_id in posts and author_id in authors]
+    by_post = Counter(comment.post_id for comment in comments)
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        counters.change_many(Post, 'comments_count', by_post)
+    queue.execute('DELETE FROM comment WHERE id <= ?', (rows[-1][0],))
+    for post_id in by_post:
+        caching.bump(caching.POST, post_id)
+    for author_id in {row[2] for row in rows}:
+        caching.bump(caching.DRAFTS, author_id)
+    return len(rows)
+
+
+def flush(batch_size=None):
+    """Разбирает всю очередь, возвращает число комментариев."""
+    batch_size = batch_size or settings.COMMENT_FLUSH_BATCH
+    total = 0
+    while True:
+        taken = flush_batch(batch_size)
+        if not taken:
+            return total
+        total += taken
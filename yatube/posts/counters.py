@@ -0,0 +1,107 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются атомарными F()-обновлениями из сигналов моделей,
+а команда reconcile_counters пересчитывает их пачками, если они
+разошлись с данными (например, после bulk_create).
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# модель со счётчиком: {поле счётчика: (считаемая модель, ссылка на неё)}
+COUNTERS = {
+    'Group': {'posts_count': ('Post', 'group')},
+    'Post': {'comments_count': ('Comment', 'post')},
+    'UserStats': {'posts_count': ('Post', 'author'),
+                  'followers_count': ('Follow', 'author'),
+                  'following_count': ('Follow', 'user')},
+}
+
+
+def change(model, pk, field, delta):
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        # Счётчик с расхождением не уходит в минус, его исправит reconcile.
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def change_many(model, field, deltas):
+    """change() для многих объектов: {pk: delta}, запрос на каждую delta."""
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        rows = model.objects.filter(pk__in=pks)
+        if delta < 0:
+            rows = rows.filter(**{f'{field}__gte': -delta})
+        rows.update(**{field: F(field) + delta})
+
+
+def user_stats(user):
+    UserStats = global_apps.get_model('posts', 'UserStats')
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats, _ = UserStats.objects.get_or_create(user=user)
+        return user.stats
+
+
+def create_missing_stats(apps, batch_size):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    missing = (User.objects.filter(stats__isnull=True)
+               .values_list('pk', flat=True))
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=batch_size, ignore_conflicts=True)
+
+
+def actual_counts(apps, model_name):
+    annotations = {}
+    for field, (counted, link) in COUNTERS[model_name].items():
+        rows = (apps.get_model('posts', counted).objects
+                .filter(**{link: OuterRef('pk')}).order_by()
+                .values(link).annotate(total=Count('pk')).values('total'))
+        annotations[f'actual_{field}'] = Coalesce(Subquery(rows), 0)
+    return annotations
+
+
+def apply_actual(obj, counters):
+    drift = False
+    for field in counters:
+        actual = getattr(obj, f'actual_{field}')
+        if getattr(obj, field) != actual:
+            setattr(obj, field, actual)
+            drift = True
+    return drift
+
+
+def reconcile(apps=global_apps, batch_size=1000):
+    """Исправляет разошедшиеся счётчики, возвращает число исправлений."""
+    create_missing_stats(apps, batch_size)
+    fixed = {}
+    for model_name, counters in COUNTERS.items():
+        model = apps.get_model('posts', model_name)
+        queryset = model.objects.order_by('pk').annotate(
+            **actual_counts(apps, model_name))
+        fixed[model_name] = 0
+        last_pk = None
+        while True:
+            batch = queryset
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = [obj for obj in batch if apply_actual(obj, counters)]
+            with transaction.atomic():
+                model.objects.bulk_update(changed, list(counters))
+            fixed[model_name] += len(changed)
+    return fixed
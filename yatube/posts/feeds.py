@@ -0,0 +1,165 @@
+"""RSS и Atom для главной страницы, групп и авторов.
+
+Лента строится одним запросом (посты с автором и группой) и кешируется
+целиком вместе с версиями тех же областей, что и HTML-страницы: новый
+или изменённый пост меняет версию, и следующий запрос строит ленту
+заново. ETag ленты — эти версии без текущего пользователя, а
+Last-Modified — время построения, поэтому агрегатор, который опрашивает
+неизменную ленту, получает 304 Not Modified без запросов к постам.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Group, Post, User
+
+FEED_TYPES = {'rss': Rss201rev2Feed, 'atom': Atom1Feed}
+
+
+class PostsFeed(Feed):
+    title_words = 10
+
+    def posts(self, obj):
+        raise NotImplementedError
+
+    def scopes(self, request, **kwargs):
+        """Области кеша, от которых зависит лента."""
+        raise NotImplementedError
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+    def items(self, obj):
+        return self.posts(obj).for_feed()[:settings.FEED_ITEMS]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(self.title_words)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse('posts:profile', args=[post.author.username])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние обновления'
+    description = 'Новые посты всех авторов.'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def scopes(self, request):
+        return [(caching.FEED, None), (caching.USERS, None)]
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return request.group
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def scopes(self, request, slug):
+        request.group = get_object_or_404(Group, slug=slug)
+        return [(caching.GROUP, request.group.pk), (caching.USERS, None)]
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return request.author
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}.'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def scopes(self, request, username):
+        request.author = get_object_or_404(User, username=username)
+        return [(caching.AUTHOR, request.author.pk), (caching.USERS, None),
+                (caching.GROUPS, None)]
+
+
+def feed_cache_key(path):
+    return f'posts:feed:{path}'
+
+
+def view(feed_class, feed_type):
+    """Представление ленты с кешем, ETag и Last-Modified."""
+    feed = feed_class()
+    feed.feed_type = FEED_TYPES[feed_type]
+
+    def cached(request, **kwargs):
+        # Запись кеша с другой версией устарела и не используется.
+        request.feed_version = caching.page_version(
+            *feed.scopes(request, **kwargs))
+        entry = cache.get(feed_cache_key(request.path))
+        if entry is not None and entry['version'] != request.feed_version:
+            entry = None
+        request.feed_entry = entry
+
+    def etag(request, **kwargs):
+        cached(request, **kwargs)
+        return request.feed_version
+
+    def last_modified(request, **kwargs):
+        entry = request.feed_entry
+        return entry['built'] if entry is not None else None
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def feed_view(request, **kwargs):
+        entry = request.feed_entry
+        if entry is None:
+            response = feed(request, **kwargs)
+            entry = {'version': request.feed_version,
+                     'built': timezone.now().replace(microsecond=0),
+                     'content_type': response['Content-Type'],
+                     'content': response.content}
+            cache.set(feed_cache_key(request.path), entry,
+                      settings.FEED_CACHE_TIMEOUT)
+        response = HttpResponse(entry['content'],
+                                content_type=entry['content_type'])
+        response['Last-Modified'] = http_date(entry['built'].timestamp())
+        return response
+
+    return feed_view
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from . import images
 from .models import Post, Comment
 
 
@@ -14,6 +16,22 @@ class PostForm(forms.ModelForm):
             'text': _('Текст нового поста'),
             'group': _('Группа, к которой будет относиться пост')}
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            image = images.normalize(image)
+        return image
+
+
+class PostAdminForm(forms.ModelForm):
+    """Форма админки: все поля поста, картинка нормализуется как в PostForm."""
+
+    class Meta:
+        model = Post
+        fields = '__all__'
+
+    clean_image = PostForm.clean_image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,103 @@
+"""Нормализация картинок постов при загрузке.
+
+Оригиналы хранятся уменьшенными до POST_IMAGE_MAX_SIZE по большей
+стороне, с применённым и удалённым EXIF, поэтому миниатюры потом
+строятся из небольших файлов. JPEG декодируется в режиме draft сразу
+в уменьшенном размере, а картинки больше POST_IMAGE_MAX_PIXELS
+отклоняются по заголовку, до декодирования.
+
+Файлы называются по хешу содержимого и общие для одинаковых картинок,
+поэтому StoredImage считает ссылки на них, а файл с миниатюрами
+удаляется только вместе с последним ссылающимся постом.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from PIL import Image, ImageOps
+from sorl import thumbnail
+
+from .models import StoredImage
+
+EXIF_ORIENTATION = 0x0112
+# формат Pillow: (расширение, параметры сохранения)
+FORMATS = {
+    'JPEG': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'PNG': ('png', {'optimize': True}),
+    'WEBP': ('webp', {'quality': 85}),
+    'GIF': ('gif', {}),
+}
+
+
+def too_large():
+    return ValidationError(
+        _('Картинка слишком большая: не больше %(limit)d мегапикселей.'),
+        code='image_too_large',
+        params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6})
+
+
+def normalize(upload):
+    """Возвращает загруженный файл, готовый к сохранению в MEDIA_ROOT."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise too_large()
+    with image:
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise too_large()
+        max_size = settings.POST_IMAGE_MAX_SIZE
+        if (max(width, height) <= max_size and image.format in FORMATS
+                and 'exif' not in image.info
+                and image.getexif().get(EXIF_ORIENTATION, 1) == 1):
+            upload.seek(0)
+            return upload
+        if getattr(image, 'is_animated', False):
+            raise ValidationError(
+                _('Анимация должна быть не больше %(size)d пикселей.'),
+                code='animation_too_large', params={'size': max_size})
+        image_format = image.format if image.format in FORMATS else 'PNG'
+        if image_format == 'JPEG':
+            # Декодер JPEG сразу уменьшает картинку в 2, 4 или 8 раз.
+            image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        output = BytesIO()
+        extension, options = FORMATS[image_format]
+        image.save(output, image_format, exif=b'', **options)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(f'{name}.{extension}', output.getvalue(),
+                              content_type=Image.MIME[image_format])
+
+
+def acquire(name):
+    if name:
+        StoredImage.objects.get_or_create(name=name)
+        StoredImage.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    deleted, _ = StoredImage.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_unused(name))
+
+
+def delete_unused(name):
+    # Пока транзакция шла, картинку могли загрузить снова.
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    try:
+        thumbnail.delete(name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT хранилищу не принадлежит.
+        pass
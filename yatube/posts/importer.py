@@ -0,0 +1,453 @@
+"""Потоковый импорт пользователей, групп, постов, комментариев и подписок.
+
+Строки файла JSONL или CSV читаются по одной и копятся пачками по
+batch_size; каждая пачка записывается через bulk_create в отдельной
+транзакции, поэтому память не растёт с размером файла. Тип строки
+задаёт поле type: user, group, post, comment или follow. Внутри пачки
+сначала пишутся пользователи и группы, потом посты, комментарии
+и подписки, так что строка может ссылаться на объекты из той же пачки.
+
+bulk_create не отправляет сигналы, поэтому счётчики, ленты подписок,
+поисковый индекс, ссылки на картинки и версии кеша обновляются здесь
+же, одним запросом на пачку, где это возможно. Строки с ошибками
+и уже существующие объекты пропускаются.
+
+id постов в файле действуют только внутри файла: новые посты получают
+свободные pk, а поле post комментариев переводится в pk по словарю,
+который хранится до конца импорта. С keep_ids id из файла становится
+pk поста; если пост с таким pk уже есть, но у него другие автор или
+текст, импорт прерывается с IdConflict.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import validate_slug
+from django.db import DatabaseError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import autocomplete, caching, counters, images, search, timeline
+from .models import Comment, Follow, Group, Post, ThumbnailJob, UserStats
+
+User = get_user_model()
+
+# Порядок записи пачки: ссылки ведут только на предыдущие типы.
+TYPES = ('user', 'group', 'post', 'comment', 'follow')
+validate_username = UnicodeUsernameValidator()
+
+
+class RowError(Exception):
+    """Строка не прошла проверку и пропускается."""
+
+
+class IdConflict(Exception):
+    """С keep_ids: pk из файла занят другим постом."""
+
+
+def read_jsonl(file):
+    """Пары (номер строки, словарь или None, если строка не JSON)."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_csv(file):
+    """Пары (номер строки, словарь); пустые ячейки считаются пропущенными."""
+    for number, row in enumerate(csv.DictReader(file), 2):
+        yield number, {key: value for key, value in row.items()
+                       if key is not None and value not in ('', None)}
+
+
+def required(row, field, max_length=None):
+    value = row.get(field)
+    if value is None or value == '':
+        raise RowError(f'нет поля {field}')
+    value = str(value)
+    if max_length is not None and len(value) > max_length:
+        raise RowError(f'{field} длиннее {max_length} символов')
+    return value
+
+
+def optional_int(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} не число')
+
+
+def pub_date(row):
+    value = row.get('pub_date')
+    if value is None:
+        return timezone.now()
+    date = parse_datetime(str(value))
+    if date is None:
+        raise RowError('pub_date не в формате ISO 8601')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def describe(error):
+    if isinstance(error, ValidationError):
+        return error.messages[0]
+    return str(error)
+
+
+def password(value):
+    """Готовый хеш Django сохраняется, пароль хешируется, пустой —
+    делает вход по паролю невозможным."""
+    if not value:
+        return make_password(None)
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return make_password(value)
+    return value
+
+
+class Importer:
+    """Копит строки и записывает их пачками.
+
+    report(номер строки, сообщение) получает ошибки строк.
+    """
+
+    def __init__(self, batch_size=1000, media_dir='.', report=None,
+                 keep_ids=False):
+        self.batch_size = batch_size
+        self.media_dir = media_dir
+        self.keep_ids = keep_ids
+        # id поста в файле → pk: записанные пачки и текущая.
+        self.post_ids = {}
+        self.batch_post_ids = {}
+        self.report = report or (lambda number, message: None)
+        self.rows = {kind: [] for kind in TYPES}
+        self.pending = 0
+        self.processed = 0
+        self.created = Counter()
+        self.skipped = 0
+        self.errors = 0
+
+    def add(self, number, row):
+        self.processed += 1
+        kind = row.get('type') if isinstance(row, dict) else None
+        if kind not in TYPES:
+            self.error(number, 'неизвестный тип строки')
+            return
+        self.rows[kind].append((number, row))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def run(self, rows):
+        for number, row in rows:
+            self.add(number, row)
+        self.flush()
+        return self
+
+    def error(self, number, message):
+        self.errors += 1
+        self.report(number, message)
+
+    def skip(self):
+        self.skipped += 1
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.rows = self.rows, {kind: [] for kind in TYPES}
+        self.pending = 0
+        created = Counter()
+        try:
+            with transaction.atomic():
+                for kind in TYPES:
+                    created[kind] = getattr(self, f'write_{kind}s')(
+                        batch[kind])
+        except DatabaseError as error:
+            first = min(rows[0][0] for rows in batch.values() if rows)
+            self.errors += sum(len(rows) for rows in batch.values())
+            self.report(first, f'пачка не записана: {error}')
+            return
+        finally:
+            batch_post_ids, self.batch_post_ids = self.batch_post_ids, {}
+        self.post_ids.update(batch_post_ids)
+        self.created.update(created)
+
+    def valid(self, rows, parse):
+        """Разобранные строки; ошибки разбора сразу сообщаются."""
+        parsed = []
+        for number, row in rows:
+            try:
+                parsed.append((number, parse(row)))
+            except (RowError, ValidationError) as error:
+                self.error(number, describe(error))
+        return parsed
+
+    def parse_user(self, row):
+        username = required(row, 'username', 150)
+        validate_username(username)
+        return User(username=username,
+                    first_name=str(row.get('first_name', ''))[:30],
+                    last_name=str(row.get('last_name', ''))[:150],
+                    email=str(row.get('email', '')),
+                    password=password(row.get('password')))
+
+    def write_users(self, rows):
+        users = {}
+        for _, user in self.valid(rows, self.parse_user):
+            if user.username in users:
+                self.skip()
+            else:
+                users[user.username] = user
+        existing = set(User.objects.filter(username__in=users)
+                       .values_list('username', flat=True))
+        new = [user for name, user in users.items() if name not in existing]
+        self.skipped += len(existing)
+        if not new:
+            return 0
+        User.objects.bulk_create(new)
+        created = User.objects.filter(username__in=[u.username for u in new])
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk)
+             for pk in created.values_list('pk', flat=True)],
+            ignore_conflicts=True)
+        autocomplete.users_added()
+        return len(new)
+
+    def parse_group(self, row):
+        slug = required(row, 'slug', 50)
+        validate_slug(slug)
+        return Group(slug=slug, title=required(row, 'title', 200),
+                     description=str(row.get('description', '')))
+
+    def write_groups(self, rows):
+        groups = {}
+        for _, group in self.valid(rows, self.parse_group):
+            if group.slug in groups:
+                self.skip()
+            else:
+                groups[group.slug] = group
+        existing = set(Group.objects.filter(slug__in=groups)
+                       .values_list('slug', flat=True))
+        new = [group for slug, group in groups.items()
+               if slug not in existing]
+        self.skipped += len(existing)
+        if not new:
+            return 0
+        Group.objects.bulk_create(new)
+        caching.bump(caching.GROUPS)
+        autocomplete.groups_changed()
+        return len(new)
+
+    def parse_post(self, row):
+        return {'id': optional_int(row, 'id'),
+                'text': required(row, 'text'),
+                'author': required(row, 'author'),
+                'group': row.get('group'),
+                'pub_date': pub_date(row),
+                'image': row.get('image')}
+
+    def write_posts(self, rows):
+        parsed = self.valid(rows, self.parse_post)
+        if not parsed:
+            return 0
+        authors = dict(User.objects.filter(
+            username__in={data['author'] for _, data in parsed},
+        ).values_list('username', 'pk'))
+        groups = dict(Group.objects.filter(
+            slug__in={data['group'] for _, data in parsed if data['group']},
+        ).values_list('slug', 'pk'))
+        # id из файла, которые станут pk.
+        ids = ({data['id'] for _, data in parsed} - {None} if self.keep_ids
+               else set())
+        existing = {pk: (author_id, text) for pk, author_id, text in
+                    Post.objects.filter(pk__in=ids)
+                    .values_list('pk', 'author_id', 'text')}
+        # SQLite не возвращает id из bulk_create, поэтому id новых постов
+        # назначаются заранее.
+        fresh = count(max([Post.objects.aggregate(Max('pk'))['pk__max'] or 0,
+                           *ids]) + 1)
+        posts = []
+        for number, data in parsed:
+            source = data['id']
+            if self.known_post(number, data, existing, authors):
+                self.skip()
+                continue
+            try:
+                if data['author'] not in authors:
+                    raise RowError(f'нет пользователя {data["author"]}')
+                if data['group'] and data['group'] not in groups:
+                    raise RowError(f'нет группы {data["group"]}')
+                image = self.save_image(data['image'])
+            except (RowError, ValidationError) as error:
+                self.error(number, describe(error))
+                continue
+            pk = source if source in ids else next(fresh)
+            if source is not None:
+                self.batch_post_ids[source] = pk
+            posts.append(Post(pk=pk, text=data['text'],
+                              author_id=authors[data['author']],
+                              group_id=groups.get(data['group']),
+                              pub_date=data['pub_date'], image=image))
+        if not posts:
+            return 0
+        Post.objects.bulk_create(posts)
+        self.after_posts(posts)
+        return len(posts)
+
+    def known_post(self, number, data, existing, authors):
+        """Пропустить ли пост: id повторяется в файле или, с keep_ids,
+        такой пост уже есть."""
+        source = data['id']
+        if source in self.batch_post_ids or source in self.post_ids:
+            return True
+        if source not in existing:
+            return False
+        if existing[source] != (authors.get(data['author']), data['text']):
+            raise IdConflict(f'строка {number}: пост {source} уже есть '
+                             f'с другими автором или текстом')
+        self.batch_post_ids[source] = source
+        return True
+
+    def post_pk(self, source):
+        """pk поста по id из файла или None, если такого поста не было."""
+        pk = self.batch_post_ids.get(source, self.post_ids.get(source))
+        if pk is None and self.keep_ids:
+            return source
+        return pk
+
+    def save_image(self, path):
+        if not path:
+            return ''
+        field = Post._meta.get_field('image')
+        try:
+            with open(os.path.join(self.media_dir, path), 'rb') as source:
+                upload = images.normalize(
+                    File(source, name=os.path.basename(path)))
+                name = field.generate_filename(None, upload.name)
+                return field.storage.save(name, upload)
+        except OSError as error:
+            raise RowError(f'картинка {path} не прочитана: {error}')
+
+    def after_posts(self, posts):
+        by_author = Counter(post.author_id for post in posts)
+        by_group = Counter(post.group_id for post in posts)
+        counters.change_many(UserStats, 'posts_count', by_author)
+        counters.change_many(Group, 'posts_count', by_group)
+        with_images = [post for post in posts if post.image]
+        for post in with_images:
+            images.acquire(post.image.name)
+        ThumbnailJob.objects.bulk_create(
+            [ThumbnailJob(post=post) for post in with_images],
+            ignore_conflicts=True)
+        search.index_many(posts)
+        timeline.fan_out_many(posts)
+        caching.bump(caching.FEED)
+        timeline.invalidate(set(Follow.objects.filter(
+            author__in=by_author).values_list('user', flat=True)))
+        for author_id in by_author:
+            caching.bump(caching.AUTHOR, author_id)
+        for group_id in by_group.keys() - {None}:
+            caching.bump(caching.GROUP, group_id)
+
+    def parse_comment(self, row):
+        post_id = optional_int(row, 'post')
+        if post_id is None:
+            raise RowError('нет поля post')
+        return {'post': post_id, 'author': required(row, 'author'),
+                'text': required(row, 'text'), 'pub_date': pub_date(row)}
+
+    def write_comments(self, rows):
+        parsed = self.valid(rows, self.parse_comment)
+        if not parsed:
+            return 0
+        authors = dict(User.objects.filter(
+            username__in={data['author'] for _, data in parsed},
+        ).values_list('username', 'pk'))
+        for _, data in parsed:
+            data['post_id'] = self.post_pk(data['post'])
+        posts = set(Post.objects.filter(
+            pk__in={data['post_id'] for _, data in parsed} - {None},
+        ).values_list('pk', flat=True))
+        comments = []
+        for number, data in parsed:
+            if data['author'] not in authors:
+                self.error(number, f'нет пользователя {data["author"]}')
+            elif data['post_id'] not in posts:
+                self.error(number, f'нет поста {data["post"]}')
+            else:
+                comments.append(Comment(
+                    post_id=data['post_id'],
+                    author_id=authors[data['author']],
+                    text=data['text'], pub_date=data['pub_date']))
+        if not comments:
+            return 0
+        Comment.objects.bulk_create(comments)
+        by_post = Counter(comment.post_id for comment in comments)
+        counters.change_many(Post, 'comments_count', by_post)
+        for post_id in by_post:
+            caching.bump(caching.POST, post_id)
+        return len(comments)
+
+    def parse_follow(self, row):
+        return required(row, 'user'), required(row, 'author')
+
+    def follow_pairs(self, parsed):
+        """{(id подписчика, id автора): номер строки} без повторов."""
+        users = dict(User.objects.filter(
+            username__in={name for _, pair in parsed for name in pair},
+        ).values_list('username', 'pk'))
+        pairs = {}
+        for number, (user, author) in parsed:
+            missing = [name for name in (user, author) if name not in users]
+            if missing:
+                self.error(number, f'нет пользователя {missing[0]}')
+            elif user == author:
+                self.error(number, 'нельзя подписаться на себя')
+            elif (users[user], users[author]) in pairs:
+                self.skip()
+            else:
+                pairs[users[user], users[author]] = number
+        return pairs
+
+    def write_follows(self, rows):
+        parsed = self.valid(rows, self.parse_follow)
+        if not parsed:
+            return 0
+        pairs = self.follow_pairs(parsed)
+        existing = set(Follow.objects.filter(
+            user__in={user_id for user_id, _ in pairs},
+            author__in={author_id for _, author_id in pairs},
+        ).values_list('user', 'author')) & pairs.keys()
+        self.skipped += len(existing)
+        new = pairs.keys() - existing
+        if not new:
+            return 0
+        Follow.objects.bulk_create([Follow(user_id=user_id,
+                                           author_id=author_id)
+                                    for user_id, author_id in new])
+        followers = Counter(author_id for _, author_id in new)
+        following = Counter(user_id for user_id, _ in new)
+        counters.change_many(UserStats, 'followers_count', followers)
+        counters.change_many(UserStats, 'following_count', following)
+        for user_id, author_id in new:
+            timeline.backfill(user_id, author_id)
+        timeline.invalidate(following)
+        for user_id in following:
+            caching.bump(caching.FOLLOWS, user_id)
+        return len(new)
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность HTML-страниц и JSON API '
+            'на текущей базе: запросов в секунду и размер ответа.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        post = Post.objects.order_by('-comments_count').first()
+        group = Group.objects.order_by('-posts_count').first()
+        reader = User.objects.order_by('-stats__following_count').first()
+        if post is None or group is None or not Follow.objects.exists():
+            raise CommandError('Нужна база с постами, группами и подписками.')
+        author = post.author.username
+        pages = (
+            ('index', 'posts:index', 'posts:api_index', []),
+            ('group', 'posts:group_list', 'posts:api_group_posts',
+             [group.slug]),
+            ('profile', 'posts:profile', 'posts:api_profile', [author]),
+            ('post', 'posts:post_detail', 'posts:api_post_detail',
+             [post.pk]),
+            ('follow', 'posts:follow_index', 'posts:api_follow', []),
+        )
+        client = Client()
+        client.force_login(reader)
+        # Как в продакшене: без debug toolbar и журнала запросов.
+        with override_settings(DEBUG=False):
+            self.compare(client, pages, options['requests'])
+
+    def compare(self, client, pages, count):
+        for name, html, api, args in pages:
+            results = [self.measure(client, reverse(url, args=args), count)
+                       for url in (html, api)]
+            self.stdout.write(f'{name}: ' + ', '.join(
+                f'{kind} {rate:.0f} запр/с, {size / 1024:.1f} КБ'
+                for kind, (rate, size) in zip(('HTML', 'API'), results)))
+
+    def measure(self, client, url, count):
+        # Первый запрос заполняет кеши, как на работающем сервере.
+        size = len(client.get(url).content)
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get(url)
+        return count / (time.perf_counter() - start), size
@@ -0,0 +1,69 @@
+import itertools
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+SYLLABLES = ('ка', 'ро', 'ми', 'та', 'ле', 'но', 'су', 'вед', 'пар', 'зо',
+             'гре', 'ны', 'бу', 'ль', 'дом', 'ска', 'тор', 'ин')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по постам через LIKE и через FTS5 '
+            'на отдельной синтетической базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Частоты слов убывают как в живом тексте: 1/ранг.
+        vocabulary = [''.join(word) for word in
+                      itertools.product(SYLLABLES, repeat=3)]
+        random.seed(0)
+        random.shuffle(vocabulary)
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        queries = (vocabulary[10], vocabulary[1000], vocabulary[5000],
+                   f'{vocabulary[20]} {vocabulary[300]}')
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(str(Path(directory) / 'bench.db'))
+            self.fill(connection, options['posts'], vocabulary, weights)
+            for name, search in (('LIKE', self.like), ('FTS5', self.match)):
+                timings = []
+                for query in queries:
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        search(connection, query)
+                    timings.append((time.perf_counter() - start)
+                                   / options['repeat'])
+                self.stdout.write(name + ': ' + ', '.join(
+                    f'«{query}» {timing * 1000:.1f} мс'
+                    for query, timing in zip(queries, timings)))
+            connection.close()
+
+    def fill(self, connection, count, vocabulary, weights):
+        connection.execute('CREATE TABLE post (id INTEGER PRIMARY KEY, '
+                           'text TEXT NOT NULL)')
+        connection.execute("CREATE VIRTUAL TABLE post_fts USING fts5("
+                           "text, tokenize = 'unicode61 remove_diacritics 2')")
+        rows = ((' '.join(random.choices(vocabulary, weights, k=20)),)
+                for _ in range(count))
+        connection.executemany('INSERT INTO post (text) VALUES (?)', rows)
+        connection.execute('INSERT INTO post_fts (rowid, text) '
+                           'SELECT id, text FROM post')
+        connection.commit()
+
+    def like(self, connection, query):
+        words = query.split()
+        where = ' AND '.join('text LIKE ?' for _ in words)
+        return connection.execute(
+            f'SELECT id FROM post WHERE {where} ORDER BY id DESC LIMIT 10',
+            [f'%{word}%' for word in words]).fetchall()
+
+    def match(self, connection, query):
+        return connection.execute(
+            'SELECT rowid FROM post_fts WHERE post_fts MATCH ? '
+            'ORDER BY bm25(post_fts), rowid LIMIT 10', [query]).fetchall()
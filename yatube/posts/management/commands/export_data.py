@@ -0,0 +1,59 @@
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты автора или группы с комментариями в JSONL '
+            'или CSV в формате import_data.')
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--author', help='Имя пользователя.')
+        scope.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--format', choices=tuple(export.FORMATS),
+                            help='Формат файла, по умолчанию по расширению.')
+        parser.add_argument('--output', default='-',
+                            help='Файл выгрузки, «-» — стандартный вывод.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=settings.EXPORT_CHUNK_SIZE,
+                            help='Постов в одном чтении из базы.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        if options['author']:
+            scope = User.objects.filter(username=options['author']).first()
+            posts = Post.objects.filter(author=scope)
+        else:
+            scope = Group.objects.filter(slug=options['group']).first()
+            posts = Post.objects.filter(group=scope)
+        if scope is None:
+            raise CommandError('Автор или группа не найдены.')
+        output = options['output']
+        file_format = options['format'] or (
+            'csv' if output.lower().endswith('.csv') else 'jsonl')
+        lines, _ = export.FORMATS[file_format]
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        start = time.perf_counter()
+        target = (nullcontext(self.stdout) if output == '-'
+                  else open(output, 'w', newline='', encoding='utf-8'))
+        with target as file:
+            rows = counted(export.rows(posts, options['chunk_size']))
+            for block in export.blocks(lines(rows), options['chunk_size']):
+                file.write(block)
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f'Строк: {count} за {elapsed:.2f} с, '
+                          f'{count / max(elapsed, 1e-9):.0f} строк/с')
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ('Записывает комментарии из очереди COMMENT_QUEUE в базу '
+            'пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.COMMENT_FLUSH_BATCH)
+        parser.add_argument('--interval', type=float,
+                            help='Разбирать очередь каждые столько секунд, '
+                                 'не завершаясь.')
+
+    def handle(self, *args, **options):
+        if not comment_queue.enabled():
+            raise CommandError('Очередь комментариев не включена: '
+                               'задайте COMMENT_QUEUE.')
+        while True:
+            start = time.perf_counter()
+            count = comment_queue.flush(options['batch_size'])
+            if count or options['interval'] is None:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'Записано комментариев: {count} '
+                                  f'за {elapsed:.2f} с')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
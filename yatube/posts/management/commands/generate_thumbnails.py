@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import ThumbnailJob
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок постов из очереди в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Пауза между проверками пустой очереди.')
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться.')
+        parser.add_argument('--all', action='store_true',
+                            help='Сначала поставить в очередь все посты '
+                                 'с картинками, у которых нет задания.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            count = thumbnails.enqueue_missing()
+            self.stdout.write(f'Поставлено в очередь: {count}')
+        # Дочерние процессы не должны наследовать соединения с базой.
+        connections.close_all()
+        with ProcessPoolExecutor(options['workers']) as pool:
+            while True:
+                done = self.process_batch(pool, options['batch_size'])
+                if options['once'] and not done:
+                    break
+                if not done:
+                    time.sleep(options['interval'])
+
+    def process_batch(self, pool, batch_size):
+        ThumbnailJob.objects.filter(post__image='').delete()
+        # Задания, исчерпавшие попытки, остаются в таблице и пропускаются,
+        # пока картинку не заменят.
+        jobs = list(ThumbnailJob.objects.filter(
+            attempts__lt=settings.THUMBNAIL_JOB_ATTEMPTS,
+        ).select_related('post')[:batch_size])
+        futures = [(job, pool.submit(thumbnails.render, job.post.image.name))
+                   for job in jobs]
+        for job, future in futures:
+            try:
+                future.result()
+                thumbnails.register(job.post)
+            except Exception as error:
+                self.stderr.write(f'Пост {job.post_id}: {error}')
+                job.attempts += 1
+                job.save(update_fields=['attempts'])
+                continue
+            job.delete()
+        return len(jobs)
@@ -0,0 +1,61 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты, комментарии '
+            'и подписки из файла JSONL или CSV пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл .jsonl или .csv, «-» — стандартный ввод.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='Формат файла, по умолчанию по расширению.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одной транзакции.')
+        parser.add_argument('--media-dir', default='.',
+                            help='Каталог, от которого отсчитаны пути '
+                                 'картинок постов.')
+        parser.add_argument('--keep-ids', action='store_true',
+                            help='Сохранить id постов из файла как pk; '
+                                 'занятый другим постом pk прерывает '
+                                 'импорт.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl')
+        read = (importer.read_csv if file_format == 'csv'
+                else importer.read_jsonl)
+        bulk = importer.Importer(
+            batch_size=options['batch_size'], media_dir=options['media_dir'],
+            keep_ids=options['keep_ids'],
+            report=lambda number, message: self.stderr.write(
+                f'Строка {number}: {message}'))
+        start = time.perf_counter()
+        try:
+            source = (nullcontext(sys.stdin) if path == '-'
+                      else open(path, newline='', encoding='utf-8'))
+        except OSError as error:
+            raise CommandError(error)
+        with source as file:
+            try:
+                bulk.run(read(file))
+            except importer.IdConflict as error:
+                raise CommandError(
+                    f'{error}. Пачки до этой строки уже записаны.')
+        elapsed = time.perf_counter() - start
+        created = ', '.join(f'{kind}: {bulk.created[kind]}'
+                            for kind in importer.TYPES)
+        self.stdout.write(f'Создано — {created}')
+        self.stdout.write(f'Пропущено: {bulk.skipped}, ошибок: {bulk.errors}')
+        self.stdout.write(
+            f'Строк: {bulk.processed} за {elapsed:.2f} с, '
+            f'{bulk.processed / max(elapsed, 1e-9):.0f} строк/с')
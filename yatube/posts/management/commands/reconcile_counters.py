@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписчиков и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile(batch_size=options['batch_size'])
+        for model_name, count in fixed.items():
+            self.stdout.write(f'{model_name}: исправлено {count}')
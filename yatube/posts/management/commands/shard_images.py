@@ -0,0 +1,61 @@
+import os
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl import thumbnail
+
+from posts import caching, thumbnails
+from posts.models import Post, StoredImage
+
+SHARDED = re.compile(r'/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.\w+$')
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в подкаталоги по хешу содержимого '
+            'и переписывает ссылки на них пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        last_pk = 0
+        moved = 0
+        while True:
+            rows = list(Post.objects.filter(pk__gt=last_pk).exclude(image='')
+                        .order_by('pk').values_list('pk', 'image')
+                        [:options['batch_size']])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            for name in sorted({name for _, name in rows
+                                if not SHARDED.search(name)}):
+                moved += self.move(field, name)
+        self.stdout.write(f'Перенесено файлов: {moved}')
+
+    def move(self, field, old_name):
+        # Сначала файл и миниатюры копируются, поэтому страницы, уже
+        # ссылающиеся на старые пути, работают до переключения.
+        try:
+            with field.storage.open(old_name) as source:
+                new_name = field.storage.save(
+                    field.generate_filename(None, os.path.basename(old_name)),
+                    source)
+        except (OSError, SuspiciousFileOperation) as error:
+            self.stderr.write(f'{old_name}: {error}')
+            return 0
+        thumbnails.copy_variants(old_name, new_name)
+        with transaction.atomic():
+            posts = list(Post.objects.filter(image=old_name)
+                         .only('author', 'group'))
+            Post.objects.filter(image=old_name).update(image=new_name)
+            StoredImage.objects.filter(name=old_name).delete()
+            StoredImage.objects.update_or_create(
+                name=new_name,
+                defaults={'refs': Post.objects.filter(image=new_name).count()})
+        for post in posts:
+            caching.post_changed(post)
+        thumbnail.delete(old_name)
+        return 1
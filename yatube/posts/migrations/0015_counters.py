@@ -0,0 +1,82 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+# Копия posts.counters.COUNTERS на момент миграции: поля, добавленные
+# позже, в этой схеме ещё не существуют.
+COUNTERS = {
+    'Group': {'posts_count': ('Post', 'group')},
+    'Post': {'comments_count': ('Comment', 'post')},
+    'UserStats': {'posts_count': ('Post', 'author'),
+                  'followers_count': ('Follow', 'author'),
+                  'following_count': ('Follow', 'user')},
+}
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    for model_name, counters in COUNTERS.items():
+        model = apps.get_model('posts', model_name)
+        annotations = {}
+        for field, (counted, link) in counters.items():
+            rows = (apps.get_model('posts', counted).objects
+                    .filter(**{link: OuterRef('pk')}).order_by()
+                    .values(link).annotate(total=Count('pk'))
+                    .values('total'))
+            annotations[field] = Coalesce(Subquery(rows), 0)
+        rows = model.objects.order_by('pk').values('pk', **{
+            f'actual_{field}': expression
+            for field, expression in annotations.items()})
+        last_pk = None
+        while True:
+            batch = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+            batch = list(batch[:BATCH_SIZE])
+            if not batch:
+                break
+            last_pk = batch[-1]['pk']
+            model.objects.bulk_update(
+                [model(pk=row['pk'], **{field: row[f'actual_{field}']
+                                        for field in counters})
+                 for row in batch],
+                list(counters))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
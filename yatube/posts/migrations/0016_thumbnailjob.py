@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def enqueue_existing(apps, schema_editor):
+    """Картинки, загруженные до очереди, тоже получают миниатюры."""
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    ids = Post.objects.exclude(image='').values_list('pk', flat=True)
+    ThumbnailJob.objects.bulk_create(
+        [ThumbnailJob(post_id=pk) for pk in ids],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnail_job', to='posts.Post')),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.RunPython(enqueue_existing, migrations.RunPython.noop),
+    ]
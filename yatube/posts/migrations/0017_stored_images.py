@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:30
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    refs = (Post.objects.exclude(image='').values('image')
+            .annotate(refs=Count('pk')).order_by())
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=row['image'], refs=row['refs']) for row in refs),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_thumbnailjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
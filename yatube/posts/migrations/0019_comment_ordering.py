@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['pub_date', 'id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date', 'id'], name='comment_post_date_id_idx'),
+        ),
+    ]
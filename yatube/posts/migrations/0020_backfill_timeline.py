@@ -0,0 +1,43 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+# settings.TIMELINE_BACKFILL на момент миграции: код миграции не должен
+# зависеть от настроек и модулей, которые изменятся позже.
+BACKFILL = 1000
+
+
+def backfill_timeline(apps, schema_editor):
+    """Заполняет ленты по подпискам, созданным до появления TimelineEntry."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    follows = Follow.objects.order_by('pk').values_list(
+        'pk', 'user_id', 'author_id')
+    last_pk = 0
+    while True:
+        batch = list(follows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        posts = {
+            author_id: list(Post.objects.filter(author=author_id)
+                            .order_by('-pub_date')
+                            .values_list('pk', 'pub_date')[:BACKFILL])
+            for author_id in {author_id for _, _, author_id in batch}}
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                           pub_date=date)
+             for _, user_id, author_id in batch
+             for pk, date in posts[author_id]],
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
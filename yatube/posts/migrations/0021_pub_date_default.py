@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_backfill_timeline'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата публикации'),
+        ),
+    ]
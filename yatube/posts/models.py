@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -8,15 +11,25 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Введите текст поста')
-    pub_date = models.DateTimeField(auto_now_add=True,
+    # Не auto_now_add: импорт и очередь комментариев пишут свою дату.
+    pub_date = models.DateTimeField(default=timezone.now, editable=False,
                                     verbose_name='Дата публикации')
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -27,10 +40,21 @@ class Post(models.Model):
                               verbose_name='Группа',
                               help_text='Выберите группу')
     image = models.ImageField(verbose_name='Картинка', upload_to='posts/',
-                              blank=True)
+                              storage=ContentAddressedStorage(), blank=True)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -42,7 +66,14 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
     text = models.TextField()
-    pub_date = models.DateTimeField(auto_now_add=True)
+    pub_date = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ['pub_date', 'id']
+        indexes = [
+            models.Index(fields=['post', 'pub_date', 'id'],
+                         name='comment_post_date_id_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -50,3 +81,50 @@ class Follow(models.Model):
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        unique_together = ('user', 'author')
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class StoredImage(models.Model):
+    """Число постов, ссылающихся на файл картинки."""
+    name = models.CharField(max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+
+class ThumbnailJob(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                related_name='thumbnail_job')
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['created']
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
@@ -0,0 +1,102 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Текст постов индексируется в виртуальной таблице posts_post_fts,
+rowid которой совпадает с id поста. Индекс обновляют сигналы сохранения
+и удаления постов, а команда rebuild_search_index строит его заново.
+Результаты сортируются по релевантности bm25 и листаются по ключу
+(релевантность, id), поэтому глубина страницы не влияет на её стоимость.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH: все слова, по префиксу.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из запроса
+    не интерпретируются.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def index(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT OR REPLACE INTO {TABLE} (rowid, text) '
+                       f'VALUES (%s, %s)', [post.pk, post.text])
+
+
+def index_many(posts):
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT OR REPLACE INTO {TABLE} (rowid, text) '
+                           f'VALUES (%s, %s)',
+                           [(post.pk, post.text) for post in posts])
+
+
+def remove(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, text) '
+                       f'SELECT id, text FROM posts_post')
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def matching(queryset, query):
+    """Посты queryset, подходящие под запрос, без сортировки по рангу."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]))
+
+
+def encode_cursor(score, pk):
+    return urlsafe_base64_encode(f'{score!r}|{pk}'.encode())
+
+
+def decode_cursor(token):
+    try:
+        score, pk = urlsafe_base64_decode(token).decode().split('|')
+        return float(score), int(pk)
+    except ValueError:
+        return None
+
+
+def find(query, limit, after=None):
+    """Страница результатов: (посты, курсор следующей страницы или None)."""
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+    sql = (f'SELECT rowid, bm25({TABLE}) AS score FROM {TABLE} '
+           f'WHERE {TABLE} MATCH %s')
+    params = [expression]
+    key = decode_cursor(after) if after else None
+    if key is not None:
+        sql += (f' AND (bm25({TABLE}) > %s'
+                f' OR (bm25({TABLE}) = %s AND rowid > %s))')
+        params += [key[0], key[0], key[1]]
+    sql += ' ORDER BY score, rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+    return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, caching, counters, images, search, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False,
+               update_fields=None, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+        autocomplete.users_added()
+    elif update_fields != frozenset({'last_login'}):
+        caching.bump(caching.USERS)
+        autocomplete.users_changed()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    caching.bump(caching.USERS)
+    autocomplete.users_changed()
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # __dict__ не вызывает дозагрузку отложенного поля.
+    instance._saved_group_id = instance.__dict__.get('group_id')
+    instance._saved_image = (instance.__dict__.get('image') if instance.pk
+                             else '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        counters.change(UserStats, instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change(Group, instance._saved_group_id, 'posts_count', -1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    # None значит, что картинка не загружалась и не могла измениться.
+    if (instance._saved_image is not None
+            and instance._saved_image != instance.image.name):
+        images.acquire(instance.image.name)
+        images.release(instance._saved_image)
+        instance._saved_image = instance.image.name
+    if update_fields is None or 'text' in update_fields:
+        search.index(instance)
+    caching.post_changed(instance, instance._saved_group_id)
+    timeline.invalidate_followers(instance.author_id)
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change(UserStats, instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+    images.release(instance._saved_image)
+    search.remove(instance.pk)
+    caching.post_changed(instance)
+    timeline.invalidate_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change(Post, instance.post_id, 'comments_count', 1)
+    caching.bump(caching.POST, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(Post, instance.post_id, 'comments_count', -1)
+    caching.bump(caching.POST, instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump(caching.GROUP, instance.pk)
+    caching.bump(caching.GROUPS)
+    caching.bump(caching.FEED)
+    autocomplete.groups_changed()
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change(UserStats, instance.author_id, 'followers_count', 1)
+        counters.change(UserStats, instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        timeline.invalidate([instance.user_id])
+        caching.bump(caching.FOLLOWS, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change(UserStats, instance.author_id, 'followers_count', -1)
+    counters.change(UserStats, instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.invalidate([instance.user_id])
+    caching.bump(caching.FOLLOWS, instance.user_id)
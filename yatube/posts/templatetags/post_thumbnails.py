@@ -0,0 +1,19 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, alias):
+    """Готовая картинка поста для <picture> или None, пока её нет."""
+    return thumbnails.resolve([post], alias).get(post.pk)
+
+
+@register.simple_tag
+def page_thumbnails(posts, alias):
+    """Пары (пост, картинка или None) для всех постов страницы сразу."""
+    posts = list(posts)
+    resolved = thumbnails.resolve(posts, alias)
+    return [(post, resolved.get(post.pk)) for post in posts]
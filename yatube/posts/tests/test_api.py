@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='kate')
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='Про котиков')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(3)]
+        cls.other = Post.objects.create(author=cls.reader, text='Чужой')
+        for number in range(3):
+            Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                                   text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, name, *args, status=200, **params):
+        response = self.client.get(reverse(f'posts:{name}', args=args),
+                                   params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_feeds(self):
+        """Ленты API содержат те же посты, что и HTML-страницы."""
+        newest = [post.pk for post in reversed(ApiTests.posts)]
+        feeds = {
+            ('api_index',): [ApiTests.other.pk, *newest],
+            ('api_group_posts', 'cats'): newest,
+            ('api_profile', 'leo'): newest,
+        }
+        for (name, *args), ids in feeds.items():
+            with self.subTest(name=name):
+                data = self.get_json(name, *args)
+                self.assertEqual([post['id'] for post in data['results']],
+                                 ids)
+        post = self.get_json('api_index')['results'][-1]
+        self.assertEqual(post, {
+            'id': ApiTests.posts[0].pk, 'text': 'Пост 0',
+            'pub_date': ApiTests.posts[0].pub_date.isoformat(),
+            'author': 'leo', 'group': 'cats', 'image': None,
+            'comments_count': 3})
+        self.get_json('api_group_posts', 'dogs', status=404)
+
+    @override_settings(POSTS_ON_PAGE=2)
+    def test_cursor_and_fields(self):
+        """Страницы листаются курсором, ?fields= выбирает поля."""
+        first = self.get_json('api_profile', 'leo', fields='id,author')
+        self.assertEqual(first['results'],
+                         [{'id': ApiTests.posts[2].pk, 'author': 'leo'},
+                          {'id': ApiTests.posts[1].pk, 'author': 'leo'}])
+        second = self.get_json('api_profile', 'leo', fields='text',
+                               after=first['next'])
+        self.assertEqual(second['results'], [{'text': 'Пост 0'}])
+        self.assertIsNone(second['next'])
+        error = self.get_json('api_index', fields='id,password', status=400)
+        self.assertIn('password', error['error'])
+
+    def test_post_and_comments(self):
+        """Пост и его комментарии, в том числе в обратном порядке."""
+        post = ApiTests.posts[0]
+        self.assertEqual(self.get_json('api_post_detail', post.pk,
+                                       fields='text,comments_count'),
+                         {'text': 'Пост 0', 'comments_count': 3})
+        texts = [comment['text'] for comment in self.get_json(
+            'api_comments', post.pk, order='newest')['results']]
+        self.assertEqual(texts, ['Комментарий 2', 'Комментарий 1',
+                                 'Комментарий 0'])
+        self.get_json('api_post_detail', 999, status=404)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и содержит посты авторов."""
+        self.get_json('api_follow', status=401)
+        self.client.force_login(ApiTests.reader)
+        data = self.get_json('api_follow', fields='id')
+        self.assertEqual(data['results'], [{'id': post.pk} for post
+                                           in reversed(ApiTests.posts)])
+
+    def test_conditional_get(self):
+        """API отвечает 304 без запросов, пока лента не изменилась."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=ApiTests.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count(self):
+        """Страница ленты — один запрос с присоединёнными автором и группой."""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:api_index'))
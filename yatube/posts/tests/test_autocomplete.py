@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group
+
+User = get_user_model()
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.create_user(username='leo', first_name='Лев',
+                                 last_name='Толстой')
+        User.objects.create_user(username='leonid')
+        User.objects.create_user(username='nick')
+        Group.objects.create(title='Лесные звери', slug='forest',
+                             description='Про лес')
+        Group.objects.create(title='Лето', slug='leto',
+                             description='Про лето')
+
+    def setUp(self):
+        cache.clear()
+
+    def complete(self, prefix):
+        return self.client.get(reverse('posts:autocomplete'),
+                               {'q': prefix}).json()
+
+    def test_prefix_matches(self):
+        """Находятся пользователи и группы по началу имени, slug и названия."""
+        result = self.complete('Le')
+        self.assertEqual([user['username'] for user in result['users']],
+                         ['leo', 'leonid'])
+        self.assertEqual(result['users'][0]['name'], 'Лев Толстой')
+        self.assertEqual(result['users'][0]['url'],
+                         reverse('posts:profile', args=['leo']))
+        self.assertEqual([group['slug'] for group in result['groups']],
+                         ['leto'])
+        self.assertEqual(
+            [group['slug'] for group in self.complete('ле')['groups']],
+            ['forest', 'leto'])
+        self.assertEqual(self.complete(''), {'users': [], 'groups': []})
+
+    def test_index_in_memory_and_refreshed(self):
+        """Повторные запросы не идут в базу, изменения видны сразу."""
+        self.complete('n')
+        with self.assertNumQueries(0):
+            result = self.complete('n')
+        self.assertEqual(len(result['users']), 1)
+        User.objects.create_user(username='nina')
+        Group.objects.create(title='Ночь', slug='night', description='')
+        result = self.complete('n')
+        self.assertEqual([user['username'] for user in result['users']],
+                         ['nick', 'nina'])
+        self.assertEqual([group['slug'] for group in result['groups']],
+                         ['night'])
+
+    def test_signup_inserts_without_full_scan(self):
+        """Регистрация добавляет в индекс только новых пользователей."""
+        self.complete('n')
+        User.objects.create_user(username='nina')
+        with self.assertNumQueries(1) as context:
+            result = self.complete('n')
+        self.assertIn('"id" > ', context.captured_queries[0]['sql'])
+        self.assertEqual([user['username'] for user in result['users']],
+                         ['nick', 'nina'])
+        self.assertEqual(
+            [user['username'] for user in self.complete('le')['users']],
+            ['leo', 'leonid'])
+
+    def test_rename_rebuilds_index(self):
+        """Изменение и удаление пользователя перестраивают индекс."""
+        self.complete('n')
+        nick = User.objects.get(username='nick')
+        nick.username = 'nikolai'
+        nick.save()
+        self.assertEqual(
+            [user['username'] for user in self.complete('ni')['users']],
+            ['nikolai'])
+        nick.delete()
+        self.assertEqual(self.complete('ni')['users'], [])
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_local_cache_polls_for_new_users(self):
+        """Кеш процесса: чужие регистрации видны по сроку, без перестроения."""
+        self.complete('n')
+        # bulk_create не шлёт сигналов, как регистрация в другом процессе.
+        User.objects.bulk_create([User(username='nadia')])
+        with self.assertNumQueries(2) as context:
+            result = self.complete('n')
+        for query in context.captured_queries:
+            self.assertIn('"id" > ', query['sql'])
+        self.assertEqual([user['username'] for user in result['users']],
+                         ['nadia', 'nick'])
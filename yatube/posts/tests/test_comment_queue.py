@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import checks, comment_queue
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+QUEUE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    COMMENT_QUEUE=os.path.join(QUEUE_DIR, 'queue.sqlite3'),
+    CACHES={'default': {'BACKEND': 'core.cache_backends.SQLiteCache',
+                        'LOCATION': os.path.join(QUEUE_DIR, 'cache.sqlite3')}},
+    PAGE_CACHE_TIMEOUT=None)
+class CommentQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='kate')
+        cls.post = Post.objects.create(author=cls.author, text='Котики')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        comment_queue.connection().execute('DELETE FROM comment')
+        self.client.force_login(CommentQueueTests.reader)
+        self.post_page = reverse('posts:post_detail',
+                                 args=[CommentQueueTests.post.pk])
+
+    def add_comment(self, text, post_id=None):
+        return self.client.post(
+            reverse('posts:add_comment',
+                    args=[post_id or CommentQueueTests.post.pk]),
+            {'text': text})
+
+    def test_comment_queued_and_visible_to_author(self):
+        """Комментарий ждёт в очереди, но автор видит его сразу."""
+        etag = self.client.get(self.post_page)['ETag']
+        self.add_comment('Мило')
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_queue.size(), 1)
+        response = self.client.get(self.post_page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Мило')
+        self.assertContains(response, 'скоро будет опубликован')
+        other = Client()
+        other.force_login(CommentQueueTests.author)
+        self.assertNotContains(other.get(self.post_page), 'Мило')
+        self.assertEqual(self.add_comment('Мило', post_id=999).status_code,
+                         404)
+
+    def test_flush_writes_batches(self):
+        """flush_comments пишет очередь пачками и обновляет страницу."""
+        for number in range(5):
+            self.add_comment(f'Комментарий {number}')
+        queued_at = comment_queue.pending(CommentQueueTests.post,
+                                          CommentQueueTests.reader)
+        out = StringIO()
+        call_command('flush_comments', '--batch-size', '2', stdout=out)
+        self.assertIn('Записано комментариев: 5', out.getvalue())
+        self.assertEqual(comment_queue.size(), 0)
+        comments = list(Comment.objects.filter(
+            post=CommentQueueTests.post))
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {number}' for number in range(5)])
+        self.assertEqual([comment.pub_date for comment in comments],
+                         [comment.pub_date for comment in queued_at])
+        self.assertEqual(Post.objects.get(pk=CommentQueueTests.post.pk)
+                         .comments_count, 5)
+        response = self.client.get(self.post_page)
+        self.assertContains(response, 'Комментарий 4')
+        self.assertNotContains(response, 'скоро будет опубликован')
+
+    def test_comments_of_deleted_post_dropped(self):
+        """Комментарии к удалённому посту не записываются."""
+        post = Post.objects.create(author=CommentQueueTests.author,
+                                   text='Временный')
+        self.add_comment('Исчезнет', post_id=post.pk)
+        post.delete()
+        self.assertEqual(comment_queue.flush(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_queue.size(), 0)
+
+    def test_comments_of_deleted_author_dropped(self):
+        """Комментарии удалённого пользователя не ломают пачку."""
+        user = User.objects.create_user(username='gone')
+        self.client.force_login(user)
+        self.add_comment('Исчезнет')
+        user.delete()
+        self.client.force_login(CommentQueueTests.reader)
+        self.add_comment('Останется')
+        self.assertEqual(comment_queue.flush(), 2)
+        self.assertEqual([comment.text for comment in Comment.objects.all()],
+                         ['Останется'])
+
+    def test_requires_shared_cache(self):
+        """С кешем в памяти процесса очередь не включается."""
+        self.assertEqual(checks.comment_queue_cache(None), [])
+        local = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(CACHES=local):
+            with self.assertRaises(ImproperlyConfigured):
+                comment_queue.enabled()
+            self.assertEqual(
+                [error.id for error in checks.comment_queue_cache(None)],
+                ['posts.E001'])
@@ -0,0 +1,87 @@
+from importlib import import_module
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.author = User.objects.create_user(username='nick')
+        cls.group = Group.objects.create(title='Котики', slug='cat',
+                                         description='Про котиков')
+        cls.other_group = Group.objects.create(title='Собаки', slug='dog',
+                                               description='Про собак')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики постов."""
+        post = Post.objects.create(author=CountersTests.author, text='Текст',
+                                   group=CountersTests.group)
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 1)
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 1)
+        post.group = CountersTests.other_group
+        post.save()
+        for group, count in ((CountersTests.group, 0),
+                             (CountersTests.other_group, 1)):
+            with self.subTest(group=group.slug):
+                group.refresh_from_db()
+                self.assertEqual(group.posts_count, count)
+        post.delete()
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 0)
+
+    def test_follow_and_comment_counters(self):
+        """Подписки и комментарии меняют соответствующие счётчики."""
+        follow = Follow.objects.create(user=CountersTests.user,
+                                       author=CountersTests.author)
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 1)
+        self.assertEqual(self.stats(CountersTests.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 0)
+        post = Post.objects.create(author=CountersTests.author, text='Текст')
+        Comment.objects.create(post=post, author=CountersTests.user,
+                               text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create([
+            Post(author=CountersTests.author, text=f'Текст №{i}',
+                 group=CountersTests.group) for i in range(3)])
+        UserStats.objects.filter(user=CountersTests.user).delete()
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 3)
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 3)
+        self.assertTrue(
+            UserStats.objects.filter(user=CountersTests.user).exists())
+
+    def test_migration_fills_counters_in_its_schema(self):
+        """Миграция 0015 считает счётчики по схеме своего времени."""
+        Post.objects.bulk_create([
+            Post(author=CountersTests.author, text=f'Текст №{i}',
+                 group=CountersTests.group) for i in range(2)])
+        UserStats.objects.filter(user=CountersTests.user).delete()
+        state = MigrationExecutor(connection).loader.project_state(
+            ('posts', '0015_counters'))
+        migration = import_module('posts.migrations.0015_counters')
+        migration.fill_counters(state.apps, None)
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 2)
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 2)
+        self.assertTrue(
+            UserStats.objects.filter(user=CountersTests.user).exists())
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo',
+                                              first_name='Лев')
+        cls.reader = User.objects.create_user(username='kate')
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='Про котиков')
+        cls.first = Post.objects.create(author=cls.author, group=cls.group,
+                                        text='Первый')
+        cls.second = Post.objects.create(author=cls.author, text='Второй')
+        Comment.objects.create(post=cls.first, author=cls.reader,
+                               text='Мило')
+        Comment.objects.create(post=cls.first, author=cls.author,
+                               text='Спасибо')
+        Comment.objects.create(post=cls.second, author=cls.reader,
+                               text='Тоже')
+        cls.other = Post.objects.create(author=cls.reader, group=cls.group,
+                                        text='Чужой')
+
+    def setUp(self):
+        self.client.force_login(ExportTests.author)
+
+    def export_rows(self, **params):
+        response = self.client.get(
+            reverse('posts:profile_export', args=['leo']), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(EXPORT_CHUNK_SIZE=1)
+    def test_profile_export_jsonl(self):
+        """Посты автора выгружаются с комментариями и их авторами."""
+        rows = [json.loads(line)
+                for line in self.export_rows().splitlines()]
+        self.assertEqual(
+            [(row['type'], row.get('username') or row.get('text'))
+             for row in rows],
+            [('user', 'leo'), ('group', None), ('post', 'Первый'),
+             ('user', 'kate'), ('comment', 'Мило'), ('comment', 'Спасибо'),
+             ('post', 'Второй'), ('comment', 'Тоже')])
+        self.assertEqual(rows[0]['first_name'], 'Лев')
+        self.assertEqual(rows[2]['group'], 'cats')
+        self.assertEqual(rows[4]['post'], ExportTests.first.pk)
+        self.assertNotIn('group', rows[6])
+        self.assertEqual(rows[7]['post'], ExportTests.second.pk)
+
+    def test_export_csv(self):
+        """CSV содержит те же строки с общим заголовком."""
+        rows = list(csv.DictReader(StringIO(self.export_rows(format='csv'))))
+        self.assertEqual([row['type'] for row in rows],
+                         ['user', 'group', 'post', 'user', 'comment',
+                          'comment', 'post', 'comment'])
+        self.assertEqual(rows[1]['slug'], 'cats')
+
+    def test_export_permissions(self):
+        """Профиль выгружает сам автор или персонал, группу — персонал."""
+        self.client.force_login(ExportTests.reader)
+        response = self.client.get(
+            reverse('posts:profile_export', args=['leo']))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            reverse('posts:group_export', args=['cats']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_import_round_trip(self):
+        """Выгрузку группы командой можно загрузить обратно."""
+        err = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cats.jsonl')
+            call_command('export_data', '--group', 'cats', '--output', path,
+                         stderr=err)
+            Post.objects.all().delete()
+            call_command('import_data', path, '--keep-ids',
+                         stdout=StringIO(), stderr=StringIO())
+        self.assertIn('строк/с', err.getvalue())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('pk', 'text')),
+            [(ExportTests.first.pk, 'Первый'),
+             (ExportTests.other.pk, 'Чужой')])
+        self.assertEqual(Post.objects.get(pk=ExportTests.first.pk)
+                         .comments_count, 2)
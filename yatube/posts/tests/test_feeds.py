@@ -0,0 +1,72 @@
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo',
+                                              first_name='Лев')
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='Про котиков')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Котики спят на солнце')
+        Post.objects.create(author=cls.author, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_posts(self):
+        """RSS и Atom главной, группы и автора содержат их посты."""
+        feeds = {
+            reverse('posts:index_rss'): 2,
+            reverse('posts:group_rss', args=['cats']): 1,
+            reverse('posts:profile_rss', args=['leo']): 2,
+        }
+        for url, count in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    'application/rss+xml'))
+                channel = ElementTree.fromstring(response.content)[0]
+                self.assertEqual(len(channel.findall('item')), count)
+        response = self.client.get(reverse('posts:group_atom',
+                                           args=['cats']))
+        feed = ElementTree.fromstring(response.content)
+        entry = feed.find(f'{ATOM}entry')
+        self.assertEqual(entry.find(f'{ATOM}link').get('href'),
+                         f'http://testserver/posts/{FeedTests.post.pk}/')
+        self.assertEqual(entry.find(f'{ATOM}author/{ATOM}name').text, 'Лев')
+        self.assertEqual(feed.find(f'{ATOM}subtitle').text, 'Про котиков')
+        self.assertEqual(
+            self.client.get(reverse('posts:group_rss',
+                                    args=['dogs'])).status_code, 404)
+
+    def test_feed_cached_and_conditional(self):
+        """Лента берётся из кеша, отвечает 304 и меняется с новым постом."""
+        url = reverse('posts:profile_atom', args=['leo'])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, response.content)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=FeedTests.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост', response.content.decode())
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
@@ -7,6 +8,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
+from PIL import Image
 
 from posts.models import Group, Post
 
@@ -138,3 +140,56 @@ class ImageFormsTest(TestCase):
         self.authorized_client.post(reverse('posts:post_create'),
                                     data=form_data, follow=True)
         self.assertEqual(Post.objects.count(), posts_count + 1)
+
+    @staticmethod
+    def get_image(size, image_format='JPEG', orientation=1):
+        image = Image.new('RGB', size, color=(255, 0, 0))
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        output = BytesIO()
+        image.save(output, image_format, exif=exif.tobytes())
+        return SimpleUploadedFile(name=f'photo.{image_format.lower()}',
+                                  content=output.getvalue(),
+                                  content_type='image/jpeg')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_image_normalized_on_upload(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Фото', 'image': self.get_image((400, 200),
+                                                     orientation=6)})
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 100))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=2_000_000)
+    def test_too_large_image_rejected(self):
+        """Картинка больше POST_IMAGE_MAX_PIXELS не сохраняется."""
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Огромное фото', 'image': self.get_image((2000, 1001))})
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(response, 'form', 'image',
+                             'Картинка слишком большая: не больше '
+                             '2 мегапикселей.')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_admin_creates_post_with_author(self):
+        """Админка создаёт пост с автором и нормализует картинку."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.authorized_client.force_login(admin)
+        response = self.authorized_client.post(
+            reverse('admin:posts_post_add'),
+            {'text': 'Пост из админки', 'author': ImageFormsTest.user.pk,
+             'group': ImageFormsTest.group.pk,
+             'image': self.get_image((400, 200))})
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(text='Пост из админки')
+        self.assertEqual(post.author, ImageFormsTest.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post, StoredImage, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class StoredImageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='leo')
+
+    def create_post(self, name):
+        uploaded = SimpleUploadedFile(name=name, content=SMALL_GIF,
+                                      content_type='image/gif')
+        return Post.objects.create(author=self.user, text='Пост',
+                                   image=uploaded)
+
+    def test_same_image_shared(self):
+        """Одинаковые картинки хранятся в одном файле со счётчиком ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(StoredImage.objects.get(name=first.image.name).refs,
+                         2)
+
+    def test_file_deleted_with_last_post(self):
+        """Файл удаляется только вместе с последним постом, где он есть."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        storage = first.image.storage
+        name = first.image.name
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_image_replaced(self):
+        """При замене картинки ссылка на старый файл освобождается."""
+        post = self.create_post('first.gif')
+        name = post.image.name
+        post.image = SimpleUploadedFile(name='new.gif',
+                                        content=SMALL_GIF + b'\x00',
+                                        content_type='image/gif')
+        post.save()
+        self.assertFalse(post.image.storage.exists(name))
+        self.assertEqual(list(StoredImage.objects.values_list('name',
+                                                              flat=True)),
+                         [post.image.name])
+
+    def test_shard_images(self):
+        """Команда shard_images переносит файлы в подкаталоги по хешу."""
+        storage = Post._meta.get_field('image').storage
+        old_name = FileSystemStorage().save('posts/flat.gif',
+                                            ContentFile(SMALL_GIF))
+        post = Post.objects.create(author=self.user, text='Старый пост',
+                                   image=old_name)
+        thumbnails.enqueue(post)
+        call_command('generate_thumbnails', once=True, workers=1)
+        call_command('shard_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, self.create_post('a.gif').image.name)
+        self.assertFalse(storage.exists(old_name))
+        self.assertEqual(StoredImage.objects.get().refs, 2)
+        picture = thumbnails.resolve([post], 'card')[post.pk]
+        self.assertIsNotNone(picture)
+        self.assertFalse(ThumbnailJob.objects.exists())
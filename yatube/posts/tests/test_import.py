@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import (Comment, Follow, Group, Post, StoredImage,
+                          ThumbnailJob, TimelineEntry)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+ROWS = [
+    {'type': 'user', 'username': 'leo', 'password': 'secret-word'},
+    {'type': 'user', 'username': 'kate'},
+    {'type': 'group', 'slug': 'cats', 'title': 'Котики'},
+    {'type': 'follow', 'user': 'kate', 'author': 'leo'},
+    {'type': 'post', 'id': 7, 'author': 'leo', 'group': 'cats',
+     'text': 'Котики спят', 'pub_date': '2020-01-02T03:04:05',
+     'image': 'cat.gif'},
+    {'type': 'post', 'author': 'leo', 'text': 'Без группы'},
+    {'type': 'comment', 'post': 7, 'author': 'kate', 'text': 'Мило',
+     'pub_date': '2020-01-03T00:00:00'},
+]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'cat.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def import_file(self, name, content, *args):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        out, err = StringIO(), StringIO()
+        call_command('import_data', path, '--media-dir', TEMP_MEDIA_ROOT,
+                     *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Импорт создаёт объекты и обновляет то, что делали сигналы."""
+        content = '\n'.join(json.dumps(row) for row in ROWS)
+        out, err = self.import_file('data.jsonl', content,
+                                    '--batch-size', '3')
+        self.assertEqual(err, '')
+        self.assertIn('строк/с', out)
+        leo = User.objects.get(username='leo')
+        self.assertTrue(leo.check_password('secret-word'))
+        self.assertFalse(User.objects.get(username='kate')
+                         .has_usable_password())
+        post = Post.objects.get(text='Котики спят')
+        self.assertEqual(post.pub_date.isoformat(),
+                         '2020-01-02T03:04:05+00:00')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(leo.stats.posts_count, 2)
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertEqual(Group.objects.get(slug='cats').posts_count, 1)
+        self.assertEqual(Comment.objects.get().pub_date.day, 3)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user__username='kate').count(), 2)
+        self.assertEqual(StoredImage.objects.get(name=post.image.name).refs,
+                         1)
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+        posts, _ = search.find('котики', 10)
+        self.assertEqual(posts, [post])
+
+    def test_import_csv_skips_bad_rows(self):
+        """Ошибочные строки сообщаются, существующие пропускаются."""
+        User.objects.create_user(username='leo')
+        content = ('type,username,user,author,text,post\n'
+                   'user,leo,,,,\n'
+                   'user,bad name!,,,,\n'
+                   'post,,,ghost,Текст,\n'
+                   'follow,,leo,leo,,\n'
+                   'comment,,,leo,Текст,999\n'
+                   'unknown,,,,,\n'
+                   'post,,,leo,Текст из CSV,\n')
+        out, err = self.import_file('data.csv', content)
+        for line in (3, 4, 5, 6, 7):
+            self.assertIn(f'Строка {line}:', err)
+        self.assertIn('Пропущено: 1, ошибок: 5', out)
+        self.assertEqual(Post.objects.get().text, 'Текст из CSV')
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(User.objects.get(username='leo').stats.posts_count,
+                         1)
+
+    def test_file_ids_do_not_collide_with_posts(self):
+        """id из файла не занимают чужой pk, комментарии не уходят к чужим."""
+        bob = User.objects.create_user(username='bob')
+        User.objects.create_user(username='leo')
+        taken = Post.objects.create(author=bob, text='Пост bob')
+        rows = [
+            {'type': 'post', 'id': taken.pk, 'author': 'leo',
+             'text': 'Пост leo'},
+            {'type': 'post', 'id': taken.pk, 'author': 'leo',
+             'text': 'Повтор id'},
+            {'type': 'comment', 'post': taken.pk, 'author': 'leo',
+             'text': 'К посту leo'},
+        ]
+        out, err = self.import_file(
+            'data.jsonl', '\n'.join(json.dumps(row) for row in rows),
+            '--batch-size', '1')
+        self.assertEqual(err, '')
+        self.assertIn('Пропущено: 1, ошибок: 0', out)
+        post = Post.objects.get(text='Пост leo')
+        self.assertNotEqual(post.pk, taken.pk)
+        self.assertEqual(Comment.objects.get().post, post)
+        taken.refresh_from_db()
+        self.assertEqual(taken.text, 'Пост bob')
+        self.assertEqual(taken.comments_count, 0)
+
+    def test_keep_ids_fails_on_conflict(self):
+        """С --keep-ids занятый чужим постом id прерывает импорт."""
+        bob = User.objects.create_user(username='bob')
+        taken = Post.objects.create(author=bob, text='Пост bob')
+        same = {'type': 'post', 'id': taken.pk, 'author': 'bob',
+                'text': 'Пост bob'}
+        comment = {'type': 'comment', 'post': taken.pk, 'author': 'bob',
+                   'text': 'Свой'}
+        out, _ = self.import_file(
+            'same.jsonl', '\n'.join(json.dumps(row)
+                                    for row in (same, comment)),
+            '--keep-ids')
+        self.assertIn('Пропущено: 1, ошибок: 0', out)
+        self.assertEqual(Comment.objects.get().post, taken)
+        other = dict(same, text='Другой текст')
+        with self.assertRaisesMessage(CommandError, f'пост {taken.pk}'):
+            self.import_file(
+                'other.jsonl', '\n'.join(json.dumps(row)
+                                         for row in (other, comment)),
+                '--keep-ids')
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Post.objects.get().text, 'Пост bob')
@@ -1,7 +1,9 @@
+from datetime import datetime, timezone
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -53,3 +55,16 @@ class PostModelTest(TestCase):
                 self.assertEqual(post._meta.get_field(field).help_text,
                                  expected_value,
                                  f'Проверьте help_text поля {field}')
+
+    def test_pub_date_given_is_kept(self):
+        """Дата публикации по умолчанию текущая, заданная сохраняется."""
+        date = datetime(2020, 1, 2, tzinfo=timezone.utc)
+        Post.objects.bulk_create(
+            [Post(author=PostModelTest.user, text='Старый', pub_date=date)])
+        Comment.objects.bulk_create([Comment(
+            post=PostModelTest.post, author=PostModelTest.user,
+            text='Старый', pub_date=date)])
+        self.assertEqual(Post.objects.get(text='Старый').pub_date, date)
+        self.assertEqual(Comment.objects.get().pub_date, date)
+        self.assertGreater(PostModelTest.post.pub_date, date)
+        self.assertFalse(Post._meta.get_field('pub_date').editable)
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='kate')
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='Про котиков')
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text=f'Пост {number}')
+                     for number in range(15)]
+        for number in range(5):
+            Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                                   text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(QueryBudgetTests.reader)
+
+    def test_pages_within_budget(self):
+        """Страницы укладываются в бюджет запросов, включая сессию
+        и пользователя, на холодном кеше."""
+        pages = {
+            'posts:index': ([], 3),
+            'posts:group_list': (['cats'], 4),
+            'posts:profile': (['leo'], 5),
+            'posts:post_detail': ([QueryBudgetTests.posts[0].pk], 4),
+            'posts:follow_index': ([], 5),
+            'posts:api_index': ([], 3),
+        }
+        budgets = {name: budget for name, (_, budget) in pages.items()}
+        with self.assertQueryBudget(budgets):
+            for name, (args, _) in pages.items():
+                self.client.get(reverse(name, args=args))
+
+    def test_budget_exceeded(self):
+        """Превышение бюджета и непроверенное представление — ошибки."""
+        with self.assertRaisesMessage(AssertionError, 'posts:index: 3 > 1'):
+            with self.assertQueryBudget({'posts:index': 1}):
+                self.client.get(reverse('posts:index'))
+        with self.assertRaisesMessage(AssertionError, 'posts:profile'):
+            with self.assertQueryBudget({'posts:profile': 10}):
+                self.client.get(reverse('posts:index'))
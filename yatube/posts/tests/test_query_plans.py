@@ -0,0 +1,74 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.author = User.objects.create_user(username='nick')
+        cls.group = Group.objects.create(title='Котики', slug='cat',
+                                         description='Про котиков')
+        for i in range(15):
+            cls.post = Post.objects.create(author=cls.author,
+                                           text=f'Текст №{i}',
+                                           group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryPlanTests.user)
+
+    def query_plans(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url, params)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    yield query['sql'], row[-1]
+
+    def test_views_do_not_scan_tables(self):
+        """Запросы страниц используют индексы без полного перебора таблиц
+        и без сортировки во временном B-дереве.
+        """
+        feeds = (reverse('posts:index'),
+                 reverse('posts:group_list', args=[QueryPlanTests.group.slug]),
+                 reverse('posts:profile',
+                         args=[QueryPlanTests.author.username]),
+                 reverse('posts:follow_index'))
+        pages = [(url, {}) for url in feeds]
+        for url in feeds:
+            page_obj = self.authorized_client.get(url).context['page_obj']
+            pages.append((url, {'after': page_obj.paginator.next_cursor}))
+        pages.append((reverse('posts:post_detail',
+                              args=[QueryPlanTests.post.pk]), {}))
+        comments = reverse('posts:comments', args=[QueryPlanTests.post.pk])
+        last = QueryPlanTests.post.comments.last()
+        cursor = self.authorized_client.get(comments).context[
+            'comments'].paginator.encode_cursor(last)
+        for order in ('oldest', 'newest'):
+            pages.append((comments, {'order': order, 'after': cursor}))
+        for url, params in pages:
+            for sql, detail in self.query_plans(url, **params):
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertNotRegex(detail, FULL_SCAN)
+                    self.assertNotIn('TEMP B-TREE', detail)
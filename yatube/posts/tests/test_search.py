@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo', is_staff=True,
+                                            is_superuser=True)
+        cls.cats = Post.objects.create(author=cls.user,
+                                       text='Котики спят на солнце')
+        cls.cat_food = Post.objects.create(
+            author=cls.user, text='Котики, котики и ещё раз котики: корм')
+        cls.dogs = Post.objects.create(author=cls.user,
+                                       text='Собаки гуляют в парке')
+
+    def search_ids(self, query, **params):
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': query, **params})
+        return [post.pk for post in response.context['page_obj']], response
+
+    def test_search_ranked(self):
+        """Поиск находит посты по словам и префиксам, лучшие первыми."""
+        ids, _ = self.search_ids('котик')
+        self.assertEqual(ids, [SearchTests.cat_food.pk, SearchTests.cats.pk])
+        self.assertEqual(self.search_ids('СОБАКИ "парк')[0],
+                         [SearchTests.dogs.pk])
+        self.assertEqual(self.search_ids('   ')[0], [])
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=SearchTests.dogs.pk)
+        post.text = 'Кошки гуляют сами по себе'
+        post.save()
+        self.assertEqual(self.search_ids('собаки')[0], [])
+        self.assertEqual(self.search_ids('кошки')[0], [post.pk])
+        post.delete()
+        self.assertEqual(self.search_ids('кошки')[0], [])
+
+    @override_settings(POSTS_ON_PAGE=1)
+    def test_search_keyset_pagination(self):
+        """Следующая страница результатов берётся по курсору."""
+        ids, response = self.search_ids('котики')
+        self.assertEqual(ids, [SearchTests.cat_food.pk])
+        after = response.context['next_cursor']
+        ids, response = self.search_ids('котики', after=after)
+        self.assertEqual(ids, [SearchTests.cats.pk])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_rebuild_and_admin_search(self):
+        """Команда перестраивает индекс, админка ищет по нему."""
+        search.remove(SearchTests.cats.pk)
+        self.assertEqual(self.search_ids('солнце')[0], [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search_ids('солнце')[0], [SearchTests.cats.pk])
+        client = Client()
+        client.force_login(SearchTests.user)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'парке'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [SearchTests.dogs])
@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailJobTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThumbnailJobTests.user)
+
+    def create_post(self):
+        uploaded = SimpleUploadedFile(name='small.gif', content=SMALL_GIF,
+                                      content_type='image/gif')
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'Пост с картинкой',
+                                     'image': uploaded})
+        return Post.objects.latest('pk')
+
+    def test_post_create_enqueues_thumbnail(self):
+        """Новая картинка ставится в очередь, страница показывает заглушку."""
+        post = self.create_post()
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+        self.assertIsNone(thumbnails.resolve([post], 'card')[post.pk])
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('aspect-ratio', content)
+        self.assertNotIn('<img class="card-img', content)
+
+    def image_without_job(self):
+        post = self.create_post()
+        ThumbnailJob.objects.all().delete()
+        return post
+
+    def test_generate_all_enqueues_existing_images(self):
+        """generate_thumbnails --all делает миниатюры старых картинок."""
+        post = self.image_without_job()
+        out = StringIO()
+        call_command('generate_thumbnails', '--all', once=True, workers=1,
+                     stdout=out)
+        self.assertIn('Поставлено в очередь: 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.resolve([post], 'card')[post.pk])
+
+    def test_migration_enqueues_existing_images(self):
+        """Миграция 0016 ставит в очередь уже загруженные картинки."""
+        post = self.image_without_job()
+        Post.objects.create(author=ThumbnailJobTests.user, text='Без фото')
+        state = MigrationExecutor(connection).loader.project_state(
+            ('posts', '0016_thumbnailjob'))
+        migration = import_module('posts.migrations.0016_thumbnailjob')
+        migration.enqueue_existing(state.apps, None)
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('post', flat=True)),
+            [post.pk])
+
+    def test_admin_enqueues_new_image(self):
+        """Картинка, загруженная в админке, ставится в очередь."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.authorized_client.force_login(admin)
+        uploaded = SimpleUploadedFile(name='small.gif', content=SMALL_GIF,
+                                      content_type='image/gif')
+        self.authorized_client.post(
+            reverse('admin:posts_post_add'),
+            {'text': 'Из админки', 'author': ThumbnailJobTests.user.pk,
+             'image': uploaded})
+        post = Post.objects.get(text='Из админки')
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+
+    def test_page_does_not_enqueue(self):
+        """Страница с ещё не готовой миниатюрой ничего не пишет в базу."""
+        post = self.create_post()
+        ThumbnailJob.objects.all().delete()
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:post_detail', args=[post.pk]))
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    @override_settings(THUMBNAIL_JOB_ATTEMPTS=1)
+    def test_failed_job_not_retried(self):
+        """Задание с исчерпанными попытками остаётся и не повторяется."""
+        post = self.create_post()
+        # Картинки хранятся по хешу содержимого и общие у постов,
+        # поэтому испорченный файл — отдельный.
+        name = default_storage.save('posts/broken.jpg',
+                                    ContentFile(b'not an image'))
+        Post.objects.filter(pk=post.pk).update(image=name)
+        post.refresh_from_db()
+        for _ in range(2):
+            call_command('generate_thumbnails', once=True, workers=1,
+                         stderr=StringIO())
+            self.client.get(reverse('posts:post_detail', args=[post.pk]))
+        job = ThumbnailJob.objects.get(post=post)
+        self.assertEqual(job.attempts, 1)
+        thumbnails.enqueue(post)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 0)
+
+    def test_worker_generates_thumbnails(self):
+        """Команда generate_thumbnails создаёт миниатюры и сбрасывает кеш."""
+        post = self.create_post()
+        self.client.get(reverse('posts:post_detail', args=[post.pk]))
+        call_command('generate_thumbnails', once=True, workers=1)
+        self.assertFalse(ThumbnailJob.objects.exists())
+        picture = thumbnails.resolve([post], 'card')[post.pk]
+        self.assertIsNotNone(picture)
+        for width in (480, 720, 960):
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', picture.srcset)
+        for page in (reverse('posts:index'),
+                     reverse('posts:post_detail', args=[post.pk])):
+            with self.subTest(page=page):
+                content = self.client.get(page).content.decode()
+                self.assertIn(f'src="{picture.src}"', content)
+                self.assertIn(f'srcset="{picture.srcset}"', content)
+
+    def test_page_thumbnails_resolved_in_one_query(self):
+        """Миниатюры страницы читаются одним запросом, а затем из кеша."""
+        for _ in range(3):
+            self.create_post()
+        call_command('generate_thumbnails', once=True, workers=1)
+        posts = list(Post.objects.all())
+        cache.clear()
+        with self.assertNumQueries(1):
+            resolved = thumbnails.resolve(posts, 'card')
+        with self.assertNumQueries(0):
+            cached = thumbnails.resolve(posts, 'card')
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertEqual(resolved[post.pk].srcset,
+                                 cached[post.pk].srcset)
@@ -0,0 +1,66 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def feed_ids(self):
+        entries = timeline.feed(TimelineTests.reader)
+        return [post.pk for post in timeline.hydrate(entries)]
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты автора."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        self.assertEqual(self.feed_ids(), [TimelineTests.old_post.pk])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу записывается в ленты подписчиков."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(author=TimelineTests.author,
+                                   text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader, post=post).exists())
+        self.assertEqual(self.feed_ids()[0], post.pk)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка удаляет посты автора из ленты."""
+        follow = Follow.objects.create(user=TimelineTests.reader,
+                                       author=TimelineTests.author)
+        follow.delete()
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_celebrity_posts_are_pulled_at_read(self):
+        """Посты популярных авторов не раскладываются при записи."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            post = Post.objects.create(author=TimelineTests.author,
+                                       text='Пост для миллиона')
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            self.assertEqual(self.feed_ids()[0], post.pk)
+
+    def test_migration_backfills_existing_follows(self):
+        """Миграция заполняет ленты по подпискам, сделанным до неё."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0020_backfill_timeline')
+        migration.backfill_timeline(apps, None)
+        self.assertEqual(self.feed_ids(), [TimelineTests.old_post.pk])
@@ -10,7 +10,8 @@ from django.urls import reverse
 from django import forms
 from time import sleep
 
-from posts.models import Group, Post, Follow
+from posts import timeline
+from posts.models import Comment, Group, Post, Follow
 
 User = get_user_model()
 
@@ -36,6 +37,7 @@ class PostsPagesTests(TestCase):
                                          group=cls.group_2)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostsPagesTests.user_1)
 
@@ -166,19 +168,72 @@ class PostsPagesTests(TestCase):
 
     def test_posts_cashe_index(self):
         """Проверяем кеширование главной страницы."""
-        posts_count = Post.objects.count()
         response_content = (
             self.authorized_client.get(reverse('posts:index')).content)
-        Post.objects.create(author=PostsPagesTests.user_1, text='text')
-        self.assertEqual(Post.objects.count(), posts_count + 1)
+        Post.objects.filter(pk=PostsPagesTests.post_1.pk).update(
+            text='Изменено в обход сигналов')
         self.assertEqual(
             response_content,
             self.authorized_client.get(reverse('posts:index')).content)
-        cache.clear()
+        Post.objects.create(author=PostsPagesTests.user_1, text='text')
         self.assertNotEqual(
             response_content,
             self.authorized_client.get(reverse('posts:index')).content)
 
+    @override_settings(PAGE_CACHE_TIMEOUT=1)
+    def test_unshared_cache_bounded(self):
+        """Без общего кеша версии и фрагменты живут PAGE_CACHE_TIMEOUT."""
+        page = reverse('posts:index')
+        response = self.client.get(page)
+        # Изменение в обход сигналов, как из другого процесса.
+        Post.objects.filter(pk=PostsPagesTests.post_1.pk).update(
+            text='Изменено в другом процессе')
+        self.assertEqual(self.client.get(page).content, response.content)
+        sleep(1.1)
+        fresh = self.client.get(page, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertContains(fresh, 'Изменено в другом процессе')
+
+    def test_pages_cache_invalidated_by_scope(self):
+        """Изменение поста сбрасывает кеш только затронутых страниц."""
+        post = PostsPagesTests.post_1
+        pages = {reverse('posts:group_list', args=[post.group.slug]): True,
+                 reverse('posts:profile', args=[post.author.username]): True,
+                 reverse('posts:post_detail', args=[post.pk]): True,
+                 reverse('posts:group_list',
+                         args=[PostsPagesTests.group_2.slug]): False,
+                 reverse('posts:profile',
+                         args=[PostsPagesTests.user_2.username]): False}
+        before = {page: self.client.get(page).content for page in pages}
+        post.text = 'Новый текст про котика'
+        post.save()
+        for page, changed in pages.items():
+            with self.subTest(page=page):
+                content = self.client.get(page).content
+                self.assertEqual(content != before[page], changed)
+        post.text = 'Текст про котика'
+        post.save()
+
+    def test_group_change_refreshes_author_and_post_pages(self):
+        """Новый адрес группы виден в профиле, посте, ленте автора и API."""
+        post = PostsPagesTests.post_2
+        pages = (reverse('posts:profile', args=[post.author.username]),
+                 reverse('posts:post_detail', args=[post.pk]),
+                 reverse('posts:profile_rss', args=[post.author.username]),
+                 reverse('posts:api_profile', args=[post.author.username]),
+                 reverse('posts:api_post_detail', args=[post.pk]))
+        etags = {page: self.client.get(page)['ETag'] for page in pages}
+        group = Group.objects.get(pk=PostsPagesTests.group_2.pk)
+        group.slug = 'wellness'
+        group.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(page,
+                                           HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, '/group/health/')
+                self.assertNotContains(response, '"health"')
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -211,6 +266,56 @@ class PaginatorViewsTest(TestCase):
                 response = self.client.get(page + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_paginator(self):
+        """Страницы листаются токенами after/before без потерь и повторов."""
+        pages = (reverse('posts:index'),
+                 reverse('posts:group_list',
+                         args=[PaginatorViewsTest.group.slug]),
+                 reverse('posts:profile',
+                         args=[PaginatorViewsTest.user.username]))
+        for page in pages:
+            with self.subTest(page=page):
+                cache.clear()
+                first = self.client.get(page).context['page_obj']
+                after = first.paginator.next_cursor
+                self.assertIsNone(first.paginator.previous_cursor)
+                second = self.client.get(page, {'after': after}).context[
+                    'page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertIsNone(second.paginator.next_cursor)
+                ids = [post.pk for post in first] + [post.pk for post in
+                                                     second]
+                self.assertEqual(len(set(ids)),
+                                 PaginatorViewsTest.count_posts)
+                before = second.paginator.previous_cursor
+                back = self.client.get(page, {'before': before}).context[
+                    'page_obj']
+                self.assertEqual([post.pk for post in back],
+                                 [post.pk for post in first])
+
+    def test_legacy_page_cached_separately(self):
+        """Кеш ?page=1 не подменяет курсорную первую страницу."""
+        pages = (reverse('posts:index'),
+                 reverse('posts:group_list',
+                         args=[PaginatorViewsTest.group.slug]),
+                 reverse('posts:profile',
+                         args=[PaginatorViewsTest.user.username]))
+        for page in pages:
+            with self.subTest(page=page):
+                cache.clear()
+                legacy = self.client.get(page, {'page': 1})
+                self.assertContains(legacy, '?page=2')
+                response = self.client.get(page)
+                self.assertNotContains(response, '?page=2')
+                self.assertContains(response, '?after=')
+
+    def test_legacy_page_is_bounded(self):
+        """Старые ссылки ?page=N не уходят дальше MAX_OFFSET_PAGE."""
+        with self.settings(MAX_OFFSET_PAGE=1):
+            response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -274,6 +379,7 @@ class FollowsTests(TestCase):
         cls.user2 = User.objects.create_user(username='nick')
 
     def setUp(self):
+        cache.clear()
         self.auth_client1 = Client()
         self.auth_client1.force_login(FollowsTests.user1)
         self.auth_client2 = Client()
@@ -321,3 +427,224 @@ class FollowsTests(TestCase):
         response = self.auth_client2.get(reverse('posts:follow_index'))
         new_count_posts = len(response.context['page_obj'])
         self.assertEqual(count_posts, new_count_posts)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Спорт', slug='sport',
+                                         description='Про спорт')
+        for i in range(settings.POSTS_ON_PAGE):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(title=f'Группа {i}',
+                                         slug=f'group_{i}',
+                                         description='Описание')
+            Post.objects.create(author=author, text=f'Пост №{i}',
+                                group=group)
+            Post.objects.create(author=cls.reader, text=f'Спорт №{i}',
+                                group=cls.group)
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTests.reader)
+
+    def test_feed_pages_query_budget(self):
+        """Число запросов к БД на страницу ленты не зависит от числа постов."""
+        pages = {reverse('posts:index'): 1,
+                 reverse('posts:group_list',
+                         args=[FeedQueriesTests.group.slug]): 2,
+                 reverse('posts:profile',
+                         args=[FeedQueriesTests.reader.username]): 2}
+        for page, budget in pages.items():
+            with self.subTest(page=page):
+                with self.assertNumQueries(budget):
+                    self.client.get(page)
+
+    def test_follow_index_query_budget(self):
+        """Лента подписок загружает авторов и группы одним запросом."""
+        # Сессия, пользователь, поиск популярных авторов, страница ленты
+        # и посты этой страницы.
+        with self.assertNumQueries(5):
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.POSTS_ON_PAGE)
+
+
+class FollowFeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.POSTS_ON_PAGE + 2):
+            Post.objects.create(author=cls.author, text=f'Пост №{i}')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowFeedCacheTests.reader)
+
+    def get_feed(self, **params):
+        response = self.authorized_client.get(reverse('posts:follow_index'),
+                                              params)
+        return response.context['page_obj']
+
+    def test_follow_feed_served_from_cache(self):
+        """Повторный запрос ленты берёт id постов из кеша."""
+        first = [post.pk for post in self.get_feed()]
+        stats = timeline.feed_cache_stats()
+        # Сессия, пользователь и посты страницы по id.
+        with self.assertNumQueries(3):
+            cached = [post.pk for post in self.get_feed()]
+        self.assertEqual(first, cached)
+        new_stats = timeline.feed_cache_stats()
+        self.assertEqual(new_stats['hit'], stats['hit'] + 1)
+        self.assertEqual(new_stats['miss'], stats['miss'])
+
+    def test_follow_feed_cache_invalidation(self):
+        """Кеш ленты сбрасывается новым постом автора и отпиской."""
+        self.get_feed()
+        post = Post.objects.create(author=FollowFeedCacheTests.author,
+                                   text='Свежий пост')
+        self.assertEqual(self.get_feed()[0].pk, post.pk)
+        Post.objects.create(author=FollowFeedCacheTests.other,
+                            text='Чужой пост')
+        self.assertEqual(self.get_feed()[0].pk, post.pk)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            args=[FollowFeedCacheTests.author.username]))
+        self.assertEqual(len(self.get_feed()), 0)
+
+    def test_follow_feed_caches_next_pages(self):
+        """Следующая страница ленты тоже попадает в кеш."""
+        after = self.get_feed().paginator.next_cursor
+        self.assertEqual(len(self.get_feed(after=after)), 2)
+        stats = timeline.feed_cache_stats()
+        self.assertEqual(len(self.get_feed(after=after)), 2)
+        self.assertEqual(timeline.feed_cache_stats()['hit'],
+                         stats['hit'] + 1)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Спорт', slug='sport',
+                                         description='Про спорт')
+        cls.post = Post.objects.create(author=cls.author, text='Пост',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменившаяся страница отвечает 304 без запросов к страницам."""
+        pages = {reverse('posts:index'): 0,
+                 reverse('posts:group_list',
+                         args=[ConditionalGetTests.group.slug]): 1,
+                 reverse('posts:profile',
+                         args=[ConditionalGetTests.author.username]): 1,
+                 reverse('posts:post_detail',
+                         args=[ConditionalGetTests.post.pk]): 1}
+        for page, budget in pages.items():
+            with self.subTest(page=page):
+                etag = self.client.get(page)['ETag']
+                with self.assertNumQueries(budget):
+                    response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes(self):
+        """ETag меняется с комментарием, подпиской и входом на сайт."""
+        post_page = reverse('posts:post_detail',
+                            args=[ConditionalGetTests.post.pk])
+        profile_page = reverse('posts:profile',
+                               args=[ConditionalGetTests.author.username])
+        etag = self.authorized_client.get(post_page)['ETag']
+        self.assertNotEqual(self.client.get(post_page)['ETag'], etag)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[ConditionalGetTests.post.pk]),
+            {'text': 'Комментарий'})
+        response = self.authorized_client.get(post_page,
+                                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = self.authorized_client.get(profile_page)['ETag']
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    args=[ConditionalGetTests.author.username]))
+        response = self.authorized_client.get(profile_page,
+                                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_etag_follows_csrf_token(self):
+        """Страница с формой не отвечает 304 с чужим CSRF-токеном."""
+        post_page = reverse('posts:post_detail',
+                            args=[ConditionalGetTests.post.pk])
+        self.authorized_client.get(post_page)
+        etag = self.authorized_client.get(post_page)['ETag']
+        response = self.authorized_client.get(post_page,
+                                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        other = Client()
+        other.force_login(ConditionalGetTests.reader)
+        response = other.get(post_page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.authorized_client.cookies['csrftoken'] = 'x' * 64
+        response = self.authorized_client.get(post_page,
+                                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(COMMENTS_ON_PAGE=20)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(author=author, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, text=f'Комментарий №{i}',
+                author=User.objects.create_user(username=f'reader_{i}'))
+            for i in range(25)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_comments_page(self):
+        """Страница поста выводит первую страницу комментариев."""
+        url = reverse('posts:post_detail',
+                      args=[CommentsPaginationTests.post.pk])
+        # Пост с автором и страница комментариев с авторами.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        comments = CommentsPaginationTests.comments
+        self.assertEqual(list(response.context['comments']), comments[:20])
+        next_cursor = response.context['comments'].paginator.next_cursor
+        self.assertContains(response, f'after={next_cursor}')
+        response = self.client.get(url, {'order': 'newest'})
+        self.assertEqual(list(response.context['comments']),
+                         comments[:-21:-1])
+
+    def test_load_more_fragment(self):
+        """Фрагмент «Показать ещё» возвращает следующую порцию."""
+        comments = CommentsPaginationTests.comments
+        url = reverse('posts:comments',
+                      args=[CommentsPaginationTests.post.pk])
+        after = self.client.get(url).context['comments'].paginator.next_cursor
+        response = self.client.get(url, {'after': after})
+        self.assertEqual(list(response.context['comments']), comments[20:])
+        self.assertContains(response, comments[-1].text)
+        self.assertNotContains(response, 'Показать ещё')
+        self.assertNotContains(response, '<html')
@@ -0,0 +1,195 @@
+"""Предварительная генерация миниатюр картинок постов.
+
+post_create, post_edit и админка ставят пост с новой картинкой
+в очередь ThumbnailJob, а команда generate_thumbnails создаёт миниатюры
+в пуле процессов вне запроса. Картинки, загруженные до очереди, ставит
+в неё миграция 0016, а пропущенные — generate_thumbnails --all.
+Каждая картинка нарезается на несколько ширин в WebP и в JPEG для
+браузеров без WebP; шаблоны выводят их через <picture> и srcset.
+Пока миниатюры не готовы, шаблоны показывают заглушку.
+"""
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore
+
+from . import caching
+from .models import Post, ThumbnailJob
+
+EMPTY = cached_db_kvstore.EMPTY_VALUE
+# имя картинки: (ширины вариантов, высота / ширина, параметры sorl)
+PICTURES = {
+    'card': ((480, 720, 960), 339 / 960, {'crop': 'center', 'upscale': True}),
+}
+# Последний формат запасной: его получает <img> внутри <picture>.
+FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+class Picture:
+    """Готовые варианты одной картинки для разметки <picture>."""
+
+    def __init__(self, alias, files):
+        widths, ratio, _ = PICTURES[alias]
+        self.width = widths[-1]
+        self.height = round(self.width * ratio)
+        srcsets = {}
+        for (image_format, width, _, _), file in zip(variants(alias), files):
+            srcsets.setdefault(image_format, []).append(f'{file.url} {width}w')
+        self.sources = [{'type': MIME_TYPES[image_format],
+                         'srcset': ', '.join(srcsets[image_format])}
+                        for image_format in FORMATS[:-1]]
+        self.srcset = ', '.join(srcsets[FORMATS[-1]])
+        self.src = files[-1].url
+
+
+def variants(alias):
+    """(формат, ширина, геометрия, параметры) всех вариантов картинки."""
+    widths, ratio, options = PICTURES[alias]
+    return [(image_format, width, f'{width}x{round(width * ratio)}',
+             {**options, 'format': image_format})
+            for image_format in FORMATS for width in widths]
+
+
+def full_options(source, options):
+    """Параметры миниатюры с умолчаниями, как в ThumbnailBackend."""
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(name, geometry, options):
+    source = ImageFile(name)
+    options = full_options(source, options)
+    thumbnail_name = default.backend._get_thumbnail_filename(
+        source, geometry, options)
+    return ImageFile(thumbnail_name, default.storage)
+
+
+def kvstore_values(keys):
+    """Значения хранилища cached_db одним get_many и одним запросом."""
+    cache = default.kvstore.cache
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing)
+                     .values_list('key', 'value'))
+        cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        # Отсутствие миниатюры кешируется, как это делает sorl, но
+        # ненадолго, если воркер не может сбросить кеш этого процесса.
+        absent = {key: EMPTY for key in missing if key not in found}
+        cache.set_many(absent, caching.bounded(
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT))
+        values.update(found)
+        values.update(absent)
+    return {key: deserialize_image_file(value)
+            for key, value in values.items() if value != EMPTY}
+
+
+def lookup(files):
+    """Записи хранилища ключей sorl для списка миниатюр."""
+    if not isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        return [default.kvstore.get(file) for file in files]
+    keys = [add_prefix(file.key) for file in files]
+    values = kvstore_values(keys)
+    return [values.get(key) for key in keys]
+
+
+def resolve(posts, alias):
+    """Готовые картинки для списка постов: {pk поста: Picture или None}.
+
+    Вместо отдельного обращения к хранилищу sorl на каждую миниатюру
+    все ключи страницы читаются из кеша одним get_many, а промахи кеша
+    добираются из базы одним запросом. В базу страница не пишет: в очередь
+    посты ставят post_create, post_edit, админка, импорт, миграция 0016
+    и generate_thumbnails --all.
+    """
+    posts = [post for post in posts if post.image]
+    per_post = len(variants(alias))
+    found = lookup([thumbnail_file(post.image.name, geometry, options)
+                    for post in posts
+                    for _, _, geometry, options in variants(alias)])
+    result = {}
+    for index, post in enumerate(posts):
+        files = found[index * per_post:(index + 1) * per_post]
+        result[post.pk] = (Picture(alias, files) if all(files) else None)
+    return result
+
+
+def enqueue_missing(batch_size=500):
+    """Ставит в очередь посты с картинками без задания, возвращает их число."""
+    ids = list(Post.objects.exclude(image='')
+               .filter(thumbnail_job__isnull=True)
+               .values_list('pk', flat=True))
+    ThumbnailJob.objects.bulk_create(
+        [ThumbnailJob(post_id=pk) for pk in ids],
+        batch_size=batch_size, ignore_conflicts=True)
+    return len(ids)
+
+
+def enqueue(post):
+    # Новая картинка получает все попытки заново.
+    if post.image:
+        ThumbnailJob.objects.update_or_create(post=post,
+                                              defaults={'attempts': 0})
+
+
+def render(name):
+    """Создаёт файлы миниатюр, не обращаясь к базе данных.
+
+    Выполняется в дочернем процессе, поэтому записи в хранилище ключей
+    делает родительский процесс в register().
+    """
+    source = ImageFile(name)
+    image = None
+    try:
+        for alias in PICTURES:
+            for _, _, geometry, options in variants(alias):
+                thumbnail = thumbnail_file(name, geometry, options)
+                if thumbnail.exists():
+                    continue
+                if image is None:
+                    image = default.engine.get_image(source)
+                options = full_options(source, options)
+                options['image_info'] = default.engine.get_image_info(image)
+                default.backend._create_thumbnail(image, geometry, options,
+                                                  thumbnail)
+    finally:
+        if image is not None:
+            default.engine.cleanup(image)
+    return name
+
+
+def copy_variants(old_name, new_name):
+    """Копирует готовые миниатюры картинки, переехавшей под новое имя."""
+    source = default.kvstore.get_or_set(ImageFile(new_name))
+    for alias in PICTURES:
+        for _, _, geometry, options in variants(alias):
+            old = default.kvstore.get(
+                thumbnail_file(old_name, geometry, options))
+            if old is None or not old.exists():
+                continue
+            new = thumbnail_file(new_name, geometry, options)
+            if not new.exists():
+                new.write(old.read())
+            new.set_size(old.size)
+            default.kvstore.set(new, source)
+
+
+def register(post):
+    for alias in PICTURES:
+        for _, _, geometry, options in variants(alias):
+            get_thumbnail(post.image.name, geometry, **options)
+    caching.post_changed(post)
@@ -0,0 +1,167 @@
+"""Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков при сохранении, поэтому
+страница /follow/ читается одним диапазоном индекса. Посты авторов,
+у которых подписчиков больше settings.TIMELINE_FANOUT_LIMIT, при записи
+не раскладываются, а подтягиваются в ленту читателя при её открытии.
+
+Первые страницы ленты (только id постов) кешируются для каждого
+читателя и сбрасываются при подписке, отписке и новых постах авторов.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from . import caching
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def fan_out(post):
+    if UserStats.objects.filter(
+            pk=post.author_id,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists():
+        return
+    followers = Follow.objects.filter(author=post.author_id)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, author_id=post.author_id,
+                       pub_date=post.pub_date)
+         for user_id in followers.values_list('user', flat=True)],
+        ignore_conflicts=True)
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: подписчики всех авторов одним запросом."""
+    authors = {post.author_id for post in posts}
+    authors -= set(UserStats.objects.filter(
+        pk__in=authors, followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('pk', flat=True))
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+            author__in=authors).values_list('user', 'author'):
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, author_id=post.author_id,
+                       pub_date=post.pub_date)
+         for post in posts for user_id in followers.get(post.author_id, [])],
+        ignore_conflicts=True)
+
+
+def backfill(user_id, author_id, since=None):
+    posts = Post.objects.filter(author=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gt=since)
+    posts = posts.values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                       pub_date=date)
+         for pk, date in posts[:settings.TIMELINE_BACKFILL]],
+        ignore_conflicts=True)
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user=user_id, author=author_id).delete()
+
+
+def pull_celebrities(user):
+    followed = Follow.objects.filter(user=user).values('author')
+    celebrities = UserStats.objects.filter(
+        user__in=followed,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user', flat=True)
+    celebrities = list(celebrities)
+    for author_id in celebrities:
+        since = TimelineEntry.objects.filter(
+            user=user, author=author_id).aggregate(Max('pub_date'))
+        backfill(user.pk, author_id, since['pub_date__max'])
+    return celebrities
+
+
+def feed(user):
+    pull_celebrities(user)
+    return TimelineEntry.objects.filter(user=user)
+
+
+def hydrate(entries):
+    return posts_by_ids([entry.post_id for entry in entries])
+
+
+def posts_by_ids(ids):
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def feed_cache_key(user_id):
+    return f'posts:follow_feed:{user_id}'
+
+
+def invalidate(user_ids):
+    cache.delete_many([feed_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_followers(author_id):
+    # Ленты подписчиков популярных авторов сверяют версию автора сами.
+    if not UserStats.objects.filter(
+            pk=author_id,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists():
+        invalidate(Follow.objects.filter(author=author_id)
+                   .values_list('user', flat=True))
+
+
+def celebrities_stamp(celebrities):
+    return caching.page_version(
+        *((caching.AUTHOR, author_id) for author_id in celebrities))
+
+
+def count_event(name):
+    key = f'posts:follow_feed:{name}'
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def feed_cache_stats():
+    stats = cache.get_many(['posts:follow_feed:hit', 'posts:follow_feed:miss'])
+    return {name: stats.get(f'posts:follow_feed:{name}', 0)
+            for name in ('hit', 'miss')}
+
+
+def load_page(user, page_obj):
+    """Заполняет страницу ленты подписок постами, по возможности из кеша.
+
+    page_obj — ленивая страница CursorPaginator по TimelineEntry.
+    """
+    paginator = page_obj.paginator
+    if paginator.legacy:
+        pull_celebrities(user)
+        page_obj.object_list = hydrate(page_obj.object_list)
+        return
+    key = feed_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None and (
+            cached['stamp'] != celebrities_stamp(cached['celebrities'])):
+        cached = None
+    if cached is not None and paginator.cursor in cached['pages']:
+        count_event('hit')
+        ids, previous_cursor, next_cursor = cached['pages'][paginator.cursor]
+        paginator.restore(previous_cursor, next_cursor)
+        page_obj.object_list = posts_by_ids(ids)
+        return
+    count_event('miss')
+    celebrities = pull_celebrities(user)
+    ids = [entry.post_id for entry in page_obj.object_list]
+    page_obj.object_list = posts_by_ids(ids)
+    if cached is None:
+        cached = {'celebrities': celebrities,
+                  'stamp': celebrities_stamp(celebrities),
+                  'pages': {}}
+    pages = cached['pages']
+    following = {f'after:{next_cursor}'
+                 for _, _, next_cursor in pages.values() if next_cursor}
+    if len(pages) < settings.FOLLOW_FEED_CACHED_PAGES and (
+            paginator.cursor == '' or paginator.cursor in following):
+        pages[paginator.cursor] = (ids, paginator.previous_cursor,
+                                   paginator.next_cursor)
+        cache.set(key, cached,
+                  caching.bounded(settings.FOLLOW_FEED_CACHE_TIMEOUT))
@@ -1,21 +1,49 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.view(feeds.IndexFeed, 'rss'), name='index_rss'),
+    path('atom/', feeds.view(feeds.IndexFeed, 'atom'), name='index_atom'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', feeds.view(feeds.GroupFeed, 'rss'),
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.view(feeds.GroupFeed, 'atom'),
+         name='group_atom'),
+    path('group/<slug:slug>/export/', views.group_export,
+         name='group_export'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/rss/', feeds.view(feeds.AuthorFeed, 'rss'),
+         name='profile_rss'),
+    path('profile/<str:username>/atom/',
+         feeds.view(feeds.AuthorFeed, 'atom'), name='profile_atom'),
+    path('profile/<str:username>/export/', views.profile_export,
+         name='profile_export'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.post_search, name='search'),
+    path('autocomplete/', views.complete, name='autocomplete'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='comments'),
     path('follow/', views.follow_index, name='follow_index'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
          name="profile_unfollow"),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/profiles/<str:username>/posts/', api.profile,
+         name='api_profile'),
+    path('api/posts/<int:post_id>/', api.post_detail,
+         name='api_post_detail'),
+    path('api/posts/<int:post_id>/comments/', api.comments,
+         name='api_comments'),
+    path('api/follow/', api.follow, name='api_follow'),
 ]
@@ -1,41 +1,98 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
+from django.views.decorators.http import condition
 
+from core.paginators import CursorPaginator
+from . import (autocomplete, caching, comment_queue, counters, export,
+               search, thumbnails, timeline)
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Comment, Group, Post, TimelineEntry, User, Follow
 
 
+def paginate(request, post_list, **kwargs):
+    paginator = CursorPaginator(post_list, settings.POSTS_ON_PAGE, **kwargs)
+    return paginator.get_page(request.GET.get('page'),
+                              after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+
+
+def comments_context(request, post):
+    """Страница комментариев поста по курсору ?after= в порядке ?order=."""
+    order = 'newest' if request.GET.get('order') == 'newest' else 'oldest'
+    comments = (Comment.objects.filter(post=post).select_related('author')
+                .only('text', 'pub_date', 'author', 'author__username'))
+    paginator = CursorPaginator(comments, settings.COMMENTS_ON_PAGE,
+                                count=post.comments_count,
+                                descending=order == 'newest')
+    comments_version = caching.page_version((caching.POST, post.pk),
+                                            (caching.USERS, None))
+    return {'comments': paginator.get_page(after=request.GET.get('after')),
+            'comments_order': order, 'comments_version': comments_version,
+            'pending_comments': comment_queue.pending(post, request.user)}
+
+
+def index_etag(request):
+    return caching.etag(request, (caching.FEED, None), (caching.USERS, None))
+
+
+@condition(etag_func=index_etag)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list)
+    cache_version = caching.page_version((caching.FEED, None),
+                                         (caching.USERS, None))
+    context = {'page_obj': page_obj, 'cache_version': cache_version}
     return render(request, template, context)
 
 
+def group_etag(request, slug):
+    # Объект нужен для версии, поэтому он сохраняется и для самой страницы.
+    request.group = get_object_or_404(Group, slug=slug)
+    return caching.etag(request, (caching.GROUP, request.group.pk),
+                        (caching.USERS, None))
+
+
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'group': group, 'page_obj': page_obj}
+    group = request.group
+    post_list = group.posts.for_feed()
+    page_obj = paginate(request, post_list, count=group.posts_count)
+    cache_version = caching.page_version((caching.GROUP, group.pk),
+                                         (caching.USERS, None))
+    context = {'group': group, 'page_obj': page_obj,
+               'cache_version': cache_version}
     return render(request, template, context)
 
 
+def profile_etag(request, username):
+    request.author = get_object_or_404(User.objects.select_related('stats'),
+                                       username=username)
+    # Посты показывают название и адрес группы.
+    scopes = [(caching.AUTHOR, request.author.pk), (caching.USERS, None),
+              (caching.GROUPS, None)]
+    if request.user.is_authenticated:
+        # Кнопка «Подписаться» зависит от подписок читателя.
+        scopes.append((caching.FOLLOWS, request.user.pk))
+    return caching.etag(request, *scopes)
+
+
+@condition(etag_func=profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    paginator = Paginator(post_list, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj, 'author': author}
+    author = request.author
+    stats = counters.user_stats(author)
+    post_list = Post.objects.for_feed().filter(author=author)
+    page_obj = paginate(request, post_list, count=stats.posts_count)
+    cache_version = caching.page_version((caching.AUTHOR, author.pk),
+                                         (caching.USERS, None),
+                                         (caching.GROUPS, None))
+    context = {'page_obj': page_obj, 'author': author,
+               'cache_version': cache_version}
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user, author=author).exists()
@@ -43,17 +100,77 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def post_etag(request, post_id):
+    request.viewed_post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    scopes = [(caching.POST, request.viewed_post.pk),
+              (caching.AUTHOR, request.viewed_post.author_id),
+              (caching.USERS, None), (caching.GROUPS, None)]
+    if comment_queue.enabled() and request.user.is_authenticated:
+        # Свои комментарии из очереди автор видит сразу.
+        scopes.append((caching.DRAFTS, request.user.pk))
+    if request.user.is_authenticated:
+        # Вошедшим показывается форма комментария с CSRF-токеном.
+        return caching.form_etag(request, *scopes)
+    return caching.etag(request, *scopes)
+
+
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = request.viewed_post
     author = post.author
-    comments = post.comments.all()
+    counters.user_stats(author)
     form = CommentForm()
-    context = {'post': post, 'author': author, 'comments': comments,
-               'form': form}
+    cache_version = caching.page_version((caching.POST, post.pk),
+                                         (caching.AUTHOR, author.pk),
+                                         (caching.USERS, None),
+                                         (caching.GROUPS, None))
+    context = {'post': post, 'author': author, 'form': form,
+               'cache_version': cache_version,
+               **comments_context(request, post)}
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    template = 'posts/includes/comment_list.html'
+    post = get_object_or_404(Post.objects.only('comments_count'), id=post_id)
+    context = {'post': post, **comments_context(request, post)}
+    return render(request, template, context)
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.find(query, settings.POSTS_ON_PAGE,
+                                     after=request.GET.get('after'))
+    context = {'query': query, 'page_obj': posts, 'next_cursor': next_cursor}
+    return render(request, template, context)
+
+
+def complete(request):
+    prefix = request.GET.get('q', '').strip()
+    return JsonResponse(autocomplete.complete(prefix))
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    return export.response(Post.objects.filter(author=author),
+                           request.GET.get('format'), username)
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export.response(Post.objects.filter(group=group),
+                           request.GET.get('format'), slug)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -69,6 +186,7 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = author
     post.save()
+    thumbnails.enqueue(post)
     return redirect('posts:profile', username=username)
 
 
@@ -87,14 +205,23 @@ def post_edit(request, post_id):
     if not form.is_valid():
         return render(request, template, {'form': form, 'groups': groups,
                                           'post': post})
-    form.save()
+    post = form.save()
+    if 'image' in form.changed_data:
+        thumbnails.enqueue(post)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
+    if comment_queue.enabled():
+        # Комментарий запишет flush_comments, здесь пост только ищется.
+        get_object_or_404(Post.objects.only('id'), id=post_id)
+        if form.is_valid():
+            comment_queue.put(post_id, request.user.pk,
+                              form.cleaned_data['text'])
+        return redirect('posts:post_detail', post_id=post_id)
+    post = get_object_or_404(Post, id=post_id)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -106,10 +233,9 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts_list, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    entries = TimelineEntry.objects.filter(user=request.user)
+    page_obj = paginate(request, entries, pk_field='post_id')
+    timeline.load_page(request.user, page_obj)
     context = {'page_obj': page_obj}
     return render(request, template, context)
 
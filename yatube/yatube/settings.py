@@ -13,6 +13,43 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+MAX_OFFSET_PAGE = 100
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL = 1000
+FOLLOW_FEED_CACHED_PAGES = 3
+FOLLOW_FEED_CACHE_TIMEOUT = 60 * 60
+THUMBNAIL_JOB_ATTEMPTS = 3
+POST_IMAGE_MAX_SIZE = 1920
+POST_IMAGE_MAX_PIXELS = 50_000_000
+EXPORT_CHUNK_SIZE = 2000
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+# Путь к очереди комментариев включает их отложенную запись,
+# например COMMENT_QUEUE=/var/spool/yatube/comments.sqlite3.
+# Нужен общий для процессов кеш (SQLITE_CACHE).
+COMMENT_QUEUE = os.getenv('COMMENT_QUEUE')
+COMMENT_FLUSH_BATCH = 500
+# Лимиты записи по имени маршрута: (запросов, за секунд[, методы]).
+# По умолчанию считаются только POST; запросы пользователя считаются
+# по нему, анонимные — по IP.
+RATELIMITS = {
+    'posts:post_create': (10, 60),
+    'posts:add_comment': (20, 60),
+    # Подписка и отписка — ссылки, их запросы GET.
+    'posts:profile_follow': (30, 60, 'GET', 'POST'),
+    'posts:profile_unfollow': (30, 60, 'GET', 'POST'),
+    'users:login': (10, 5 * 60),
+    'users:signup': (5, 60 * 60),
+}
+# Страница /metrics/ доступна сотрудникам и с этих адресов, например
+# METRICS_IPS=10.0.0.5,10.0.0.6. За прокси REMOTE_ADDR у всех запросов —
+# адрес прокси, поэтому по умолчанию список пуст.
+METRICS_IPS = [ip for ip in os.getenv('METRICS_IPS', '').split(',') if ip]
+# Имя общего для процессов кеша из CACHES, например default вместе
+# с SQLITE_CACHE; без него у каждого процесса свои метрики.
+METRICS_CACHE = os.getenv('METRICS_CACHE')
+METRICS_FLUSH_INTERVAL = 10
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -45,11 +82,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -73,6 +112,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.page_cache.page_cache_timeout',
             ],
         },
     },
@@ -128,3 +168,18 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# С кешем в памяти у каждого процесса свои версии страниц, и изменение,
+# сделанное в одном процессе, не сбрасывает кеш остальных. Поэтому
+# версии и фрагменты страниц живут не дольше PAGE_CACHE_TIMEOUT секунд;
+# с общим кешем — без срока.
+PAGE_CACHE_TIMEOUT = 20
+
+# Общий для всех процессов кеш в файле SQLite, например
+# SQLITE_CACHE=/var/cache/yatube/cache.sqlite3
+if os.getenv('SQLITE_CACHE'):
+    CACHES['default'] = {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.getenv('SQLITE_CACHE'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+    PAGE_CACHE_TIMEOUT = None